@@ -0,0 +1,394 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+# ---------------------------------------------------------
+# CONFIG
+# ---------------------------------------------------------
+SCAN_DIR = os.path.dirname(os.path.abspath(__file__))
+REPEAT = 5
+
+# ---------------------------------------------------------
+# UTILIDADES
+# ---------------------------------------------------------
+def run_probe(code, *args):
+    """
+    Ejecuta un fragmento en un proceso nuevo (caché y RSS limpios) y
+    devuelve el JSON que imprime en su última línea.
+    """
+    prelude = (
+        "import sys, time, json, resource\n"
+        f"sys.path.insert(0, {SCAN_DIR!r})\n"
+        "t0 = time.perf_counter()\n"
+    )
+    out = subprocess.run([sys.executable, "-c", prelude + code, *args],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def print_table(title, rows):
+    print(f"\n📊 {title}")
+    for name, value in rows:
+        print(f"  {name:<28} {value}")
+
+# ---------------------------------------------------------
+# BENCHMARKS
+# ---------------------------------------------------------
+PROBE_LOAD_MODEL = """
+import scanner
+# El .pkl busca RiskKeywordCounter en __main__: mismo __getattr__ perezoso
+# que tiene scanner.py cuando se ejecuta como script
+from scanner import __getattr__
+scanner.MODEL_DIR = sys.argv[1]
+model, msg = scanner.load_model(sys.argv[2])
+assert model is not None, msg
+elapsed = time.perf_counter() - t0
+print(json.dumps({"seconds": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+def bench_model_load(model_path):
+    """
+    Mide scanner.load_model (imports y verificación de vigencia incluidos)
+    con .pkl, con formato compacto en frío (hash del .pkl sin caché) y con
+    la huella ya cacheada en source_check.json.
+    """
+    from compact_model import SOURCE_CHECK_FILE, compact_path_for
+
+    compact_dir = compact_path_for(model_path)
+    if not os.path.isdir(compact_dir):
+        print(f"❌ No existe {compact_dir}. Ejecute: python compact_model.py export {model_path}")
+        sys.exit(1)
+    name = os.path.basename(model_path)
+    lang = name[len("best_model_"):-len(".pkl")]
+    lang = "python" if lang == "hybrid" else lang
+    model_dir = os.path.dirname(os.path.abspath(model_path))
+    check_path = os.path.join(compact_dir, SOURCE_CHECK_FILE)
+
+    def measure(target_dir, before=None):
+        runs = []
+        for _ in range(REPEAT):
+            if before:
+                before()
+            runs.append(run_probe(PROBE_LOAD_MODEL, target_dir, lang))
+        return runs
+
+    def drop_check():
+        if os.path.exists(check_path):
+            os.remove(check_path)
+
+    results = []
+    with tempfile.TemporaryDirectory() as pkl_only:
+        # Directorio con solo el .pkl: load_model no encuentra el compacto
+        os.symlink(os.path.abspath(model_path), os.path.join(pkl_only, name))
+        results.append(("joblib (.pkl)", measure(pkl_only)))
+    results.append(("compacto frío", measure(model_dir, drop_check)))
+    results.append(("compacto caché", measure(model_dir)))
+
+    rows = []
+    for label, runs in results:
+        rows.append((f"{label} tiempo", f"{median([r['seconds'] for r in runs]) * 1000:.1f} ms"))
+        rows.append((f"{label} RSS máx.", f"{median([r['max_rss_kb'] for r in runs]) / 1024:.1f} MiB"))
+    print_table(f"scanner.load_model ({REPEAT} ejecuciones, mediana)", rows)
+
+PROBE_IMPORTS = """
+import scanner
+print(json.dumps({"heavy": [m for m in ("numpy", "sklearn", "joblib") if m in sys.modules]}))
+"""
+
+def bench_startup(n_files=20):
+    """
+    Tiempo de arranque de scanner.py en una ejecución solo-reglas
+    (MODEL_DIR vacío), comparado con un intérprete sin trabajo.
+    """
+    scanner_path = os.path.join(SCAN_DIR, "scanner.py")
+    with tempfile.TemporaryDirectory() as work:
+        src_dir = os.path.join(work, "src")
+        os.makedirs(src_dir)
+        paths = []
+        for i in range(n_files):
+            path = os.path.join(src_dir, f"file_{i}.js")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("const a = 1;\nvar b = el.innerHTML = data;\n" * 20)
+            paths.append(path)
+        list_path = os.path.join(work, "changed_files.txt")
+        with open(list_path, "w") as f:
+            f.write("\n".join(paths))
+
+        def wall(cmd):
+            samples = []
+            for _ in range(REPEAT):
+                t0 = time.perf_counter()
+                subprocess.run(cmd, cwd=work, capture_output=True, check=True)
+                samples.append(time.perf_counter() - t0)
+            return median(samples)
+
+        base = wall([sys.executable, "-c", "pass"])
+        total = wall([sys.executable, scanner_path, list_path])
+
+    heavy = run_probe(PROBE_IMPORTS)["heavy"]
+    print_table(f"Arranque solo-reglas ({n_files} archivos, {REPEAT} ejecuciones, mediana)", [
+        ("python -c pass", f"{base * 1000:.1f} ms"),
+        ("scanner.py", f"{total * 1000:.1f} ms"),
+        ("overhead del escáner", f"{(total - base) * 1000:.1f} ms"),
+        ("módulos pesados importados", ", ".join(heavy) or "ninguno"),
+    ])
+
+def synthetic_report(run, n_files=50, findings_per_file=5):
+    """Reporte sintético; cada ejecución cambia algunos hallazgos."""
+    report = {}
+    for i in range(n_files):
+        findings = [{
+            "type": "prototype_pollution",
+            "severity": "HIGH",
+            "line": j + 1,
+            "snippet": f"obj.prototype.k{(i * 7 + j + run) % 40} = v;"
+        } for j in range(findings_per_file)]
+        report[f"frontend/src/file_{i}.ts"] = {
+            "language": "javascript", "verdict": "HIGH", "score": 0.8,
+            "ml_prob": (i + run) % 100 / 100.0, "findings": findings
+        }
+    return report
+
+def bench_history(n_runs=2000):
+    """Latencia de diff/trend con un historial de n_runs ejecuciones."""
+    from history import record_run, diff_runs, file_trend
+
+    with tempfile.TemporaryDirectory() as work:
+        db_path = os.path.join(work, "history.sqlite")
+        t0 = time.perf_counter()
+        for run in range(n_runs):
+            record_run(db_path, synthetic_report(run), label="main" if run % 10 == 0 else f"pr-{run}")
+        load = time.perf_counter() - t0
+
+        def timed(fn, *args):
+            samples = []
+            for _ in range(REPEAT):
+                t = time.perf_counter()
+                result = fn(*args)
+                samples.append(time.perf_counter() - t)
+            return median(samples), result
+
+        t_diff, diff = timed(diff_runs, db_path, "main")
+        t_trend, trend = timed(file_trend, db_path, "frontend/src/file_3.ts")
+
+    print_table(f"Historial SQLite ({n_runs} ejecuciones, {n_runs * 250} hallazgos)", [
+        ("inserción total", f"{load:.1f} s"),
+        ("diff vs 'main'", f"{t_diff * 1000:.2f} ms ({len(diff['new'])} nuevos, {len(diff['fixed'])} corregidos)"),
+        ("trend de un archivo", f"{t_trend * 1000:.2f} ms ({len(trend)} puntos)"),
+    ])
+
+def bench_findings_memory(n_files=200, lines_per_file=500):
+    """
+    Memoria retenida por los hallazgos de un corpus ruidoso (muchas
+    coincidencias de prototype_pollution): Finding con __slots__ frente
+    al dict por hallazgo que usaba el reporte antes.
+    """
+    import gc
+    import tracemalloc
+    from scanner import run_rules
+
+    line = "Foo.prototype.bar{} = function () {{ return this.__proto__; }};"
+    corpus = ["\n".join(line.format(i * lines_per_file + j) for j in range(lines_per_file))
+              for i in range(n_files)]
+
+    gc.collect()
+    tracemalloc.start()
+    findings = [f for code in corpus for f in run_rules(code, "javascript")[0]]
+    slotted = tracemalloc.get_traced_memory()[0]
+
+    # Representación anterior: un dict por hallazgo (mismos snippets)
+    as_dicts = [f.to_dict() for f in findings]
+    del findings
+    gc.collect()
+    dicts = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    n = len(as_dicts)
+    print_table(f"Memoria de hallazgos ({n} hallazgos, {n_files} archivos)", [
+        ("dict por hallazgo (antes)", f"{dicts / 2**20:.1f} MiB ({dicts / n:.0f} B/hallazgo)"),
+        ("Finding __slots__ (ahora)", f"{slotted / 2**20:.1f} MiB ({slotted / n:.0f} B/hallazgo)"),
+        ("reducción", f"{(1 - slotted / dicts) * 100:.0f}%"),
+    ])
+
+def bench_rules_redos(line_chars=(1000, 4000, 20000, 1_000_000)):
+    """
+    Peor caso de las reglas marcadas como costosas (RISKY_RULES) en líneas
+    minificadas largas: búsqueda sobre la línea entera frente a la búsqueda
+    por tramos con presupuesto por defecto.
+    """
+    from scanner import RISKY_RULES, RULES_DB, run_rules
+
+    print("⚠️ Patrones marcados al cargar:")
+    for lang, rule_id, risks in RISKY_RULES:
+        print(f"   {lang}/{rule_id}: {'; '.join(risks)}")
+
+    rows = []
+    for n in line_chars:
+        code = "exec" * (n // 4)
+        if n <= 20000:
+            t0 = time.perf_counter()
+            for r in RULES_DB["javascript"]:
+                r["rx"].search(code)
+            raw = f"{(time.perf_counter() - t0) * 1000:8.1f} ms"
+        else:
+            raw = "   (omitido)"
+        t0 = time.perf_counter()
+        _, skipped = run_rules(code, "javascript")
+        limited = time.perf_counter() - t0
+        rows.append((f"línea de {n} caracteres",
+                     f"línea entera {raw} | por tramos {limited * 1000:7.1f} ms "
+                     f"({len(skipped)} reglas omitidas por tiempo)"))
+    print_table("Reglas JavaScript sobre una línea minificada", rows)
+
+def load_any_model(path):
+    """Carga un .pkl (joblib) o un directorio de modelo compacto."""
+    if os.path.isdir(path):
+        from compact_model import load_compact
+        return load_compact(path)
+    import joblib
+    import __main__
+    from scanner import RiskKeywordCounter
+    # Los pickles entrenados referencian __main__.RiskKeywordCounter
+    __main__.RiskKeywordCounter = RiskKeywordCounter
+    return joblib.load(path)
+
+def bench_window_memory(model_path, window=200, overlap=100):
+    """
+    Pico de memoria de la inferencia (tracemalloc) sobre archivos sintéticos
+    crecientes: documento completo frente a ventanas de líneas.
+    """
+    import tracemalloc
+    from scanner import clean_code, score_windows
+
+    model = load_any_model(model_path)
+    line = "const v{0} = fetch(url + id{0}).then(r => r.json()); el.textContent = v{0};"
+
+    rows = []
+    for n_lines in (1_000, 10_000, 100_000):
+        raw = "\n".join(line.format(i) for i in range(n_lines))
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        model.predict_proba([clean_code(raw)])
+        t_full = time.perf_counter() - t0
+        full = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        score_windows(model, raw, window, overlap)
+        t_win = time.perf_counter() - t0
+        windowed = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        rows.append((f"{n_lines} líneas ({len(raw) / 2**20:.1f} MiB)",
+                     f"completo {full / 2**20:7.1f} MiB {t_full:6.2f} s | "
+                     f"ventanas {windowed / 2**20:6.1f} MiB {t_win:6.2f} s"))
+    print_table(f"Pico de memoria de inferencia (ventana {window}/{overlap} líneas)", rows)
+
+PROBE_HTML_STREAM = """
+import io, contextlib
+from generate_report import generate_html_report
+with contextlib.redirect_stdout(io.StringIO()):
+    ok = generate_html_report(sys.argv[1], sys.argv[2])
+print(json.dumps({"ok": ok, "seconds": time.perf_counter() - t0,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+# Flujo anterior: json.load + json.dumps + una única cadena con todo el HTML
+PROBE_HTML_LEGACY = """
+with open(sys.argv[1], encoding="utf-8") as f:
+    data = json.load(f)
+payload = json.dumps(data, indent=4, ensure_ascii=False)
+html = f"<html><script>const reportData = {payload};</script></html>"
+with open(sys.argv[2], "w", encoding="utf-8") as f:
+    f.write(html)
+print(json.dumps({"ok": True, "seconds": time.perf_counter() - t0,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+def bench_html_report():
+    """
+    RSS máximo y tiempo al generar el HTML: reportes con muchas entradas
+    pequeñas y un reporte con un solo archivo muy ruidoso (una entrada de
+    decenas de MiB, el peor caso del lector incremental).
+    """
+    from generate_report import write_report_data
+
+    def many_files(n_files):
+        return ((f"frontend/src/{i}.ts", data)
+                for i in range(n_files)
+                for data in synthetic_report(i, n_files=1).values())
+
+    def noisy_file(n_findings):
+        yield from synthetic_report(0, n_files=3).items()
+        yield from synthetic_report(0, n_files=1, findings_per_file=n_findings).items()
+
+    cases = [(f"{n} archivos", many_files, n) for n in (10_000, 100_000, 400_000)]
+    cases.append(("1 archivo, 150k hallazgos", noisy_file, 150_000))
+
+    rows = []
+    with tempfile.TemporaryDirectory() as work:
+        html_path = os.path.join(work, "report.html")
+        for i, (label, entries, n) in enumerate(cases):
+            json_path = os.path.join(work, f"report_{i}.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                write_report_data(f, entries(n))
+            size = os.path.getsize(json_path) / 2**20
+
+            stream = run_probe(PROBE_HTML_STREAM, json_path, html_path)
+            legacy = run_probe(PROBE_HTML_LEGACY, json_path, html_path)
+            rows.append((f"{label} ({size:.0f} MiB)",
+                         f"streaming {stream['max_rss_kb'] / 1024:6.1f} MiB {stream['seconds']:5.1f} s | "
+                         f"anterior {legacy['max_rss_kb'] / 1024:7.1f} MiB {legacy['seconds']:5.1f} s"))
+    print_table("RSS máximo del generador HTML", rows)
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def main():
+    if len(sys.argv) < 2:
+        print("Uso:")
+        print("  python benchmark.py model_load <best_model_x.pkl>")
+        print("  python benchmark.py startup")
+        print("  python benchmark.py history [n_ejecuciones]")
+        print("  python benchmark.py findings_memory")
+        print("  python benchmark.py window_memory <best_model_x.pkl | best_model_x.compact>")
+        print("  python benchmark.py html_report")
+        print("  python benchmark.py rules_redos")
+        sys.exit(1)
+
+    action = sys.argv[1]
+
+    if action == "model_load":
+        bench_model_load(sys.argv[2])
+
+    elif action == "startup":
+        bench_startup()
+
+    elif action == "history":
+        bench_history(int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
+
+    elif action == "findings_memory":
+        bench_findings_memory()
+
+    elif action == "window_memory":
+        bench_window_memory(sys.argv[2])
+
+    elif action == "html_report":
+        bench_html_report()
+
+    elif action == "rules_redos":
+        bench_rules_redos()
+
+    else:
+        print("❌ Acción no reconocida")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import os
+import re
+import sys
+import json
+import math
+import shutil
+import hashlib
+import numpy as np
+
+# ---------------------------------------------------------
+# 1. FORMATO COMPACTO
+# ---------------------------------------------------------
+# Un modelo compacto es un directorio "best_model_<lang>.compact/" con:
+#   meta.json           -> estructura del pipeline, hiperparámetros y
+#                          huella (tamaño + sha256) del .pkl de origen
+#   <n>_terms.npy       -> vocabulario ordenado: términos UTF-8 concatenados (uint8, mmap)
+#   <n>_offsets.npy     -> inicio de cada término en <n>_terms.npy, más el final (int64, mmap)
+#   <n>_prefixes.npy    -> primeros PREFIX_BYTES bytes de cada término (búsqueda vectorizada, mmap)
+#   <n>_columns.npy     -> columna de cada término del vocabulario (mmap)
+#   <n>_idf.npy         -> pesos idf del vectorizador (mmap)
+#   coef.npy            -> coeficientes del clasificador lineal (mmap)
+#   source_check.json   -> caché del sha256 del .pkl (ver stale_reason)
+# Solo depende de numpy: no deserializa el grafo de objetos de sklearn y
+# varios procesos comparten las mismas páginas de los arrays.
+COMPACT_SUFFIX = ".compact"
+FORMAT_VERSION = 2
+# Los términos se ubican por su prefijo con searchsorted (vectorizado) y se
+# desempata con búsqueda binaria sobre los bytes completos. Un término largo
+# (base64, identificadores minificados) solo ocupa su propio largo.
+PREFIX_BYTES = 16
+SOURCE_CHECK_FILE = "source_check.json"
+
+# Tolerancia máxima entre predict_proba original y el modelo compacto
+TOLERANCE = 1e-9
+
+# ---------------------------------------------------------
+# 2. CARGADOR (sin sklearn)
+# ---------------------------------------------------------
+class _CompactVectorizer:
+    def __init__(self, meta, model_dir, prefix):
+        self.lowercase = meta["lowercase"]
+        self.token_pattern = re.compile(meta["token_pattern"])
+        self.ngram_range = tuple(meta["ngram_range"])
+        self.stop_words = frozenset(meta["stop_words"] or [])
+        self.binary = meta["binary"]
+        self.sublinear_tf = meta.get("sublinear_tf", False)
+        self.norm = meta.get("norm")
+        self.offset = meta["offset"]
+        self.n_terms = meta["n_terms"]
+        # numpy no puede mapear un array vacío: vocabulario vacío -> carga normal
+        mmap = "r" if self.n_terms else None
+        # np.asarray: vistas ndarray sobre el mismo mmap (sin copia); indexar
+        # np.memmap directamente es varias veces más lento en el bucle
+        load = lambda name: np.asarray(np.load(os.path.join(model_dir, f"{prefix}_{name}.npy"), mmap_mode=mmap))
+        self.terms = memoryview(load("terms"))
+        self.offsets = load("offsets")
+        self.prefixes = load("prefixes")
+        self.columns = load("columns")
+        idf_path = os.path.join(model_dir, f"{prefix}_idf.npy")
+        self.idf = np.load(idf_path, mmap_mode="r") if meta.get("use_idf") else None
+
+    def _tokens(self, text):
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_pattern.findall(text)
+        if self.stop_words:
+            tokens = [t for t in tokens if t not in self.stop_words]
+
+        # Réplica de VectorizerMixin._word_ngrams de sklearn
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        original = tokens
+        n_original = len(original)
+        if min_n == 1:
+            tokens = list(original)
+            min_n += 1
+        else:
+            tokens = []
+        for n in range(min_n, min(max_n + 1, n_original + 1)):
+            for i in range(n_original - n + 1):
+                tokens.append(" ".join(original[i:i + n]))
+        return tokens
+
+    def _term(self, i):
+        return bytes(self.terms[self.offsets[i]:self.offsets[i + 1]])
+
+    def _lookup(self, keys):
+        """Índice de cada término en el vocabulario ordenado, o -1 si no está."""
+        prefixes = np.array([k[:PREFIX_BYTES] for k in keys], dtype=f"S{PREFIX_BYTES}")
+        lengths = np.fromiter((len(k) for k in keys), dtype=np.int64, count=len(keys))
+        lo = np.searchsorted(self.prefixes, prefixes, side="left")
+        hi = np.searchsorted(self.prefixes, prefixes, side="right")
+
+        # Claves de hasta PREFIX_BYTES: el término igual a la clave es el
+        # primero de su rango (más corto que los que la extienden), basta
+        # comparar prefijo y largo
+        cand = np.minimum(lo, self.n_terms - 1)
+        term_len = self.offsets[cand + 1] - self.offsets[cand]
+        found = np.where((lo < hi) & (term_len == lengths) & (self.prefixes[cand] == prefixes), lo, -1)
+
+        # Claves más largas: búsqueda binaria sobre los bytes completos dentro
+        # del rango de términos con el mismo prefijo (contiguos por el orden)
+        for i in np.flatnonzero((lengths > PREFIX_BYTES) & (lo < hi)):
+            key = keys[i]
+            left, right = int(lo[i]), int(hi[i])
+            end = right
+            while left < right:
+                mid = (left + right) // 2
+                if self._term(mid) < key:
+                    left = mid + 1
+                else:
+                    right = mid
+            found[i] = left if left < end and self._term(left) == key else -1
+        return found
+
+    def transform(self, text):
+        """Devuelve (columnas, valores) de la fila dispersa del documento."""
+        counts = {}
+        for t in self._tokens(text):
+            counts[t] = counts.get(t, 0) + 1
+        if not counts or self.n_terms == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        pos = self._lookup([k.encode("utf-8") for k in counts])
+        hit = pos >= 0
+
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))[hit]
+        cols = np.asarray(self.columns[pos[hit]], dtype=np.int64)
+        if self.binary:
+            tf = np.ones_like(tf)
+        if self.sublinear_tf:
+            tf = np.log(tf) + 1.0
+        if self.idf is not None:
+            tf = tf * self.idf[cols]
+        if self.norm == "l2":
+            n = math.sqrt(float(np.dot(tf, tf)))
+            if n > 0:
+                tf = tf / n
+        elif self.norm == "l1":
+            n = float(np.abs(tf).sum())
+            if n > 0:
+                tf = tf / n
+        return cols + self.offset, tf
+
+
+class _CompactKeywordCounter:
+    def __init__(self, meta):
+        self.keywords = [k.lower() for k in meta["keywords"]]
+        self.offset = meta["offset"]
+
+    def transform(self, text):
+        n = len(self.keywords) + 1
+        cols = np.arange(self.offset, self.offset + n, dtype=np.int64)
+        if not isinstance(text, str):
+            return cols, np.zeros(n, dtype=np.float64)
+        text_lower = text.lower()
+        row = [text_lower.count(k) for k in self.keywords]
+        row.append(len(text) / 1000.0)
+        return cols, np.array(row, dtype=np.float64)
+
+
+class CompactModel:
+    """
+    Clasificador lineal binario cargado desde el formato compacto.
+    Expone predict_proba con la misma semántica que el pipeline de sklearn.
+    """
+    def __init__(self, model_dir):
+        with open(os.path.join(model_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Versión de formato compacto no soportada: {meta.get('version')}")
+
+        self.parts = []
+        for i, part in enumerate(meta["features"]):
+            if part["kind"] == "vectorizer":
+                self.parts.append((_CompactVectorizer(part, model_dir, str(i)), part["weight"]))
+            else:
+                self.parts.append((_CompactKeywordCounter(part), part["weight"]))
+        self.coef = np.load(os.path.join(model_dir, "coef.npy"), mmap_mode="r")
+        self.intercept = float(meta["intercept"])
+
+    def decision_function(self, X):
+        scores = np.empty(len(X), dtype=np.float64)
+        for i, text in enumerate(X):
+            z = self.intercept
+            for part, weight in self.parts:
+                cols, vals = part.transform(text)
+                if len(cols):
+                    z += weight * float(np.dot(self.coef[cols], vals))
+            scores[i] = z
+        return scores
+
+    def predict_proba(self, X):
+        z = self.decision_function(X)
+        # exp(-z) desborda a inf para z muy negativo; 1 / inf = 0 es el límite correcto
+        with np.errstate(over="ignore"):
+            p = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p, p])
+
+
+def compact_path_for(model_path):
+    """Ruta del modelo compacto equivalente a un best_model_*.pkl."""
+    return os.path.splitext(model_path)[0] + COMPACT_SUFFIX
+
+def load_compact(model_dir):
+    return CompactModel(model_dir)
+
+def source_fingerprint(model_path):
+    """Tamaño y sha256 del .pkl (el mtime no sirve: git checkout lo cambia)."""
+    h = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return {"size": os.path.getsize(model_path), "sha256": h.hexdigest()}
+
+def _cached_fingerprint(model_dir, model_path):
+    """
+    source_fingerprint con caché en SOURCE_CHECK_FILE, indexada por
+    (tamaño, mtime_ns, inodo) del .pkl: solo el primer arranque tras un
+    checkout o un reentrenamiento recorre el pickle completo.
+    """
+    st = os.stat(model_path)
+    key = [st.st_size, st.st_mtime_ns, st.st_ino]
+    cache_path = os.path.join(model_dir, SOURCE_CHECK_FILE)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("key") == key:
+            return cached["fingerprint"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    fingerprint = source_fingerprint(model_path)
+    try:
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "fingerprint": fingerprint}, f)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass  # Directorio de solo lectura: se recalcula en cada arranque
+    return fingerprint
+
+def stale_reason(model_dir, model_path):
+    """
+    Motivo por el que el modelo compacto no corresponde al .pkl actual
+    (p. ej. se reentrenó sin volver a exportar), o None si está al día o no
+    hay .pkl contra el cual comparar.
+    """
+    if not os.path.exists(model_path):
+        return None
+    with open(os.path.join(model_dir, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    recorded = meta.get("source_fingerprint")
+    if meta.get("version") != FORMAT_VERSION:
+        return f"formato compacto v{meta.get('version')} (se requiere v{FORMAT_VERSION})"
+    if recorded is None:
+        return "exportado sin huella del .pkl de origen"
+    if recorded.get("size") != os.path.getsize(model_path):
+        return "el tamaño del .pkl cambió desde la exportación"
+    if recorded != _cached_fingerprint(model_dir, model_path):
+        return "el sha256 del .pkl cambió desde la exportación"
+    return None
+
+# ---------------------------------------------------------
+# 3. EXPORTACIÓN (requiere sklearn)
+# ---------------------------------------------------------
+def _vectorizer_meta(vec, offset):
+    from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+
+    if not isinstance(vec, CountVectorizer):
+        raise ValueError(f"Vectorizador no soportado: {type(vec).__name__}")
+    if vec.analyzer != "word" or vec.preprocessor is not None or vec.tokenizer is not None:
+        raise ValueError("Solo se soporta analyzer='word' sin preprocessor/tokenizer propios")
+    if vec.strip_accents is not None:
+        raise ValueError("strip_accents no está soportado en el formato compacto")
+
+    stop = vec.get_stop_words()
+    meta = {
+        "kind": "vectorizer",
+        "offset": offset,
+        "lowercase": bool(vec.lowercase),
+        "token_pattern": vec.token_pattern,
+        "ngram_range": list(vec.ngram_range),
+        "stop_words": sorted(stop) if stop else None,
+        "binary": bool(vec.binary),
+    }
+    if isinstance(vec, TfidfVectorizer):
+        meta.update({
+            "use_idf": bool(vec.use_idf),
+            "sublinear_tf": bool(vec.sublinear_tf),
+            "norm": vec.norm,
+        })
+    return meta
+
+def _feature_parts(features):
+    from sklearn.pipeline import FeatureUnion
+
+    if isinstance(features, FeatureUnion):
+        weights = features.transformer_weights or {}
+        return [(t, weights.get(name, 1.0)) for name, t in features.transformer_list
+                if t not in (None, "drop")]
+    return [(features, 1.0)]
+
+def export_model(model_path, out_dir=None):
+    """
+    Convierte un pipeline entrenado (best_model_*.pkl) al formato compacto.
+
+    Args:
+        model_path: Ruta al .pkl generado con joblib
+        out_dir: Directorio de salida (por defecto junto al .pkl)
+    Returns:
+        Ruta del directorio generado
+    """
+    import joblib
+    from sklearn.pipeline import Pipeline
+
+    pipeline = joblib.load(model_path)
+    if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+        raise ValueError("Se esperaba un Pipeline [features, clasificador]")
+
+    clf = pipeline.steps[-1][1]
+    if not hasattr(clf, "coef_") or not hasattr(clf, "predict_proba") or clf.coef_.shape[0] != 1:
+        raise ValueError(f"Clasificador no soportado: {type(clf).__name__} (se requiere lineal binario con predict_proba)")
+    if type(clf).__name__ == "SGDClassifier" and clf.loss != "log_loss":
+        raise ValueError("SGDClassifier solo se soporta con loss='log_loss'")
+
+    out_dir = out_dir or compact_path_for(model_path)
+    tmp_dir = out_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    features = []
+    offset = 0
+    for i, (part, weight) in enumerate(_feature_parts(pipeline.steps[0][1])):
+        if type(part).__name__ == "RiskKeywordCounter":
+            features.append({"kind": "keywords", "offset": offset,
+                             "keywords": list(part.keywords), "weight": weight})
+            offset += len(part.keywords) + 1
+            continue
+
+        meta = _vectorizer_meta(part, offset)
+        meta["weight"] = weight
+        vocab = part.vocabulary_
+        encoded = sorted((term.encode("utf-8"), col) for term, col in vocab.items())
+        meta["n_terms"] = len(encoded)
+        lengths = np.array([len(t) for t, _ in encoded], dtype=np.int64)
+        np.save(os.path.join(tmp_dir, f"{i}_terms.npy"),
+                np.frombuffer(b"".join(t for t, _ in encoded), dtype=np.uint8))
+        np.save(os.path.join(tmp_dir, f"{i}_offsets.npy"),
+                np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64))
+        np.save(os.path.join(tmp_dir, f"{i}_prefixes.npy"),
+                np.array([t[:PREFIX_BYTES] for t, _ in encoded], dtype=f"S{PREFIX_BYTES}"))
+        np.save(os.path.join(tmp_dir, f"{i}_columns.npy"),
+                np.array([c for _, c in encoded], dtype=np.int32))
+        if meta.get("use_idf"):
+            np.save(os.path.join(tmp_dir, f"{i}_idf.npy"), np.asarray(part.idf_, dtype=np.float64))
+        features.append(meta)
+        offset += len(vocab)
+
+    if offset != clf.coef_.shape[1]:
+        raise ValueError(f"Dimensión de features ({offset}) distinta a coef_ ({clf.coef_.shape[1]})")
+
+    np.save(os.path.join(tmp_dir, "coef.npy"), np.ascontiguousarray(clf.coef_[0], dtype=np.float64))
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "source": os.path.basename(model_path),
+            "source_fingerprint": source_fingerprint(model_path),
+            "classes": [str(c) for c in clf.classes_],
+            "intercept": float(np.ravel(clf.intercept_)[0]),
+            "features": features,
+        }, f, indent=4)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+def max_abs_diff(model_path, compact_dir, texts):
+    """Máxima diferencia de probabilidad entre el .pkl y el modelo compacto."""
+    import joblib
+
+    if not texts:
+        return 0.0
+    expected = joblib.load(model_path).predict_proba(texts)[:, 1]
+    actual = load_compact(compact_dir).predict_proba(texts)[:, 1]
+    return float(np.max(np.abs(expected - actual)))
+
+# ---------------------------------------------------------
+# 4. CLI
+# ---------------------------------------------------------
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != "export":
+        print("Uso:")
+        print("  python compact_model.py export <best_model_x.pkl> [changed_files.txt]")
+        sys.exit(1)
+
+    from scanner import clean_code
+
+    model_path = sys.argv[2]
+    out_dir = export_model(model_path)
+    print(f"📦 Modelo compacto generado: {out_dir}")
+
+    # Verificación de equivalencia sobre un corpus de muestra
+    texts = ["const x = eval(userInput) + password", "print('hola mundo')", ""]
+    if len(sys.argv) > 3:
+        with open(sys.argv[3]) as f:
+            for path in (line.strip() for line in f):
+                if path and os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8', errors='ignore') as src:
+                        texts.append(src.read())
+    diff = max_abs_diff(model_path, out_dir, [clean_code(t) for t in texts])
+    if diff > TOLERANCE:
+        shutil.rmtree(out_dir, ignore_errors=True)
+        print(f"❌ Las predicciones difieren ({diff:.3e} > {TOLERANCE:.0e}); se descartó la exportación")
+        sys.exit(1)
+    print(f"✅ Predicciones equivalentes en {len(texts)} muestras (máx. diferencia {diff:.3e})")
+
+
+if __name__ == "__main__":
+    # Los pickles entrenados referencian RiskKeywordCounter desde __main__
+    from scanner import RiskKeywordCounter  # noqa: F401
+    main()
@@ -1,14 +1,109 @@
 import json
 import os
+import re
 from datetime import datetime
 import sys
 
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+def iter_report_entries(json_file, chunk_size=1 << 16):
+    """
+    Lee el reporte de forma incremental y genera pares (archivo, resultado).
+    Admite el JSON del escáner (un objeto ruta -> resultado) o JSONL (un
+    objeto {"ruta": resultado} por línea). Solo mantiene en memoria el
+    bloque leído y la entrada en curso.
+
+    Mientras una entrada no cabe en el buffer, cada lectura duplica la
+    anterior: raw_decode re-analiza la entrada desde su inicio en cada
+    intento, y el crecimiento geométrico mantiene ese costo lineal.
+    """
+    with open(json_file, 'r', encoding='utf-8') as f:
+        if json_file.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield from json.loads(line).items()
+            return
+
+        decoder = json.JSONDecoder()
+        buf, pos, eof = "", 0, False
+
+        def fill(size=chunk_size):
+            nonlocal buf, pos, eof
+            chunk = f.read(size)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                pos = _WHITESPACE.match(buf, pos).end()
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        def expect(char):
+            nonlocal pos
+            skip_ws()
+            if buf[pos:pos + 1] != char:
+                raise json.JSONDecodeError(f"Expecting '{char}'", buf, pos)
+            pos += 1
+
+        def value():
+            nonlocal pos
+            skip_ws()
+            size = chunk_size
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    # Un número al final del bloque podría estar cortado
+                    if end < len(buf) or eof:
+                        pos = end
+                        return obj
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill(size)
+                size *= 2
+
+        fill()
+        expect("{")
+        skip_ws()
+        if buf[pos:pos + 1] == "}":
+            return
+        while True:
+            key = value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting property name enclosed in double quotes", buf, pos)
+            expect(":")
+            yield key, value()
+            skip_ws()
+            if buf[pos:pos + 1] == "}":
+                return
+            expect(",")
+
+def write_report_data(out, entries):
+    """
+    Escribe el objeto JS con los datos del reporte entrada por entrada. El
+    resultado es idéntico a json.dumps(reporte, indent=4, ensure_ascii=False).
+    """
+    count = 0
+    out.write("{")
+    for filename, data in entries:
+        body = json.dumps(data, indent=4, ensure_ascii=False).replace("\n", "\n    ")
+        out.write(",\n" if count else "\n")
+        out.write(f"    {json.dumps(filename, ensure_ascii=False)}: {body}")
+        count += 1
+    out.write("\n}" if count else "}")
+    return count
+
 def generate_html_report(json_file="security_scan/reports/security_report.json", output_file="security_scan/reports/security_report.html"):
     """
     Genera un reporte HTML interactivo a partir del archivo JSON de seguridad.
+    El reporte se procesa en streaming: las partes estáticas y los datos se
+    escriben directamente al archivo de salida, con memoria constante.
     
     Args:
-        json_file: Ruta al archivo JSON con el reporte de seguridad
+        json_file: Ruta al archivo JSON (o JSONL) con el reporte de seguridad
         output_file: Nombre del archivo HTML de salida
     """
     
@@ -17,26 +112,11 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
         print(f"❌ Error: No se encuentra el archivo '{json_file}'")
         return False
     
-    # Cargar datos del JSON
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            report_data = json.load(f)
-        print(f"✅ Archivo JSON cargado: {len(report_data)} archivos encontrados")
-    except json.JSONDecodeError as e:
-        print(f"❌ Error al parsear JSON: {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Error al leer archivo: {e}")
-        return False
-    
-    # Convertir los datos de Python a JavaScript
-    report_data_json = json.dumps(report_data, indent=4, ensure_ascii=False)
-    
     # Obtener fecha y hora actual
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    # Plantilla HTML completa
-    html_template = f"""<!DOCTYPE html>
+    # Plantilla HTML: cabecera estática hasta los datos del reporte
+    html_head = f"""<!DOCTYPE html>
 <html lang="es">
 <head>
     <meta charset="UTF-8">
@@ -124,6 +204,7 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
         .stat-card.high .number {{ color: #dd6b20; }}
         .stat-card.medium .number {{ color: #d69e2e; }}
         .stat-card.safe .number {{ color: #38a169; }}
+        .stat-card.deferred .number {{ color: #718096; }}
 
         .charts-section {{
             display: grid;
@@ -236,6 +317,11 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
             color: #276749;
         }}
 
+        .badge.deferred {{
+            background: #e2e8f0;
+            color: #4a5568;
+        }}
+
         .file-info {{
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
@@ -370,6 +456,7 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
                 <option value="HIGH">High</option>
                 <option value="MEDIUM">Medium</option>
                 <option value="SAFE">Safe</option>
+                <option value="DEFERRED">Diferido (plazo)</option>
             </select>
             <select id="languageFilter">
                 <option value="all">Todos los lenguajes</option>
@@ -382,7 +469,10 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
 
     <script>
         // Datos cargados dinámicamente desde JSON
-        const reportData = {report_data_json};
+        const reportData = """
+
+    # Plantilla HTML: resto estático tras los datos del reporte
+    html_tail = f""";
 
         // Calcular estadísticas
         function calculateStats() {{
@@ -391,6 +481,7 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
                 high: 0,
                 medium: 0,
                 safe: 0,
+                deferred: 0,
                 totalFiles: Object.keys(reportData).length
             }};
 
@@ -425,6 +516,12 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
                     <div class="number">${{stats.safe}}</div>
                     <p>Archivos seguros</p>
                 </div>
+                ${{stats.deferred ? `
+                <div class="stat-card deferred">
+                    <h3>Deferred</h3>
+                    <div class="number">${{stats.deferred}}</div>
+                    <p>No analizados (plazo)</p>
+                </div>` : ''}}
             `;
             document.getElementById('stats').innerHTML = statsHTML;
         }}
@@ -437,10 +534,10 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
             new Chart(document.getElementById('severityChart'), {{
                 type: 'doughnut',
                 data: {{
-                    labels: ['Critical', 'High', 'Medium', 'Safe'],
+                    labels: ['Critical', 'High', 'Medium', 'Safe', 'Deferred'],
                     datasets: [{{
-                        data: [stats.critical, stats.high, stats.medium, stats.safe],
-                        backgroundColor: ['#e53e3e', '#dd6b20', '#d69e2e', '#38a169']
+                        data: [stats.critical, stats.high, stats.medium, stats.safe, stats.deferred],
+                        backgroundColor: ['#e53e3e', '#dd6b20', '#d69e2e', '#38a169', '#a0aec0']
                     }}]
                 }},
                 options: {{
@@ -533,16 +630,26 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
                             </div>
                             <div class="info-item">
                                 <span class="info-label">Score</span>
-                                <span class="info-value">${{(data.score * 100).toFixed(1)}}%</span>
+                                <span class="info-value">${{data.deferred ? 'No analizado (plazo)' : (data.score * 100).toFixed(1) + '%'}}</span>
                             </div>
                             <div class="info-item">
                                 <span class="info-label">ML Probability</span>
-                                <span class="info-value">${{(data.ml_prob * 100).toFixed(1)}}%</span>
+                                <span class="info-value">${{data.deferred ? 'No analizado (plazo)' : data.ml_prob === null ? 'Omitido (reglas)' : (data.ml_prob * 100).toFixed(1) + '%'}}</span>
                             </div>
                             <div class="info-item">
                                 <span class="info-label">Hallazgos</span>
                                 <span class="info-value">${{data.findings.length}}</span>
                             </div>
+                            ${{data.ml_windows ? `
+                            <div class="info-item">
+                                <span class="info-label">Ventanas de mayor riesgo</span>
+                                <span class="info-value">${{data.ml_windows.map(w => `L${{w.lines[0]}}-${{w.lines[1]}} (${{(w.ml_prob * 100).toFixed(1)}}%)`).join(', ')}}</span>
+                            </div>` : ''}}
+                            ${{data.rules_skipped ? `
+                            <div class="info-item">
+                                <span class="info-label">Reglas omitidas por tiempo${{data.incomplete ? ' (análisis incompleto)' : ''}}</span>
+                                <span class="info-value">${{data.rules_skipped.map(r => `${{r.rule}} (${{r.reason}}, L${{r.first_line}}, ${{r.count}})`).join(', ')}}</span>
+                            </div>` : ''}}
                         </div>
                         <div class="findings">
                             <h4>Vulnerabilidades detectadas:</h4>
@@ -604,18 +711,29 @@ def generate_html_report(json_file="security_scan/reports/security_report.json",
 </body>
 </html>"""
     
-    # Escribir el archivo HTML
+    # Escribir el archivo HTML (temporal + rename: no queda un HTML a medias)
+    tmp_file = output_file + ".tmp"
     try:
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_template)
+        os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(html_head)
+            total = write_report_data(f, iter_report_entries(json_file))
+            f.write(html_tail)
+        os.replace(tmp_file, output_file)
+        print(f"✅ Archivo JSON procesado: {total} archivos encontrados")
         print(f"✅ Reporte HTML generado exitosamente: '{output_file}'")
-        print(f"📊 Total de archivos analizados: {len(report_data)}")
+        print(f"📊 Total de archivos analizados: {total}")
         return True
+    except json.JSONDecodeError as e:
+        print(f"❌ Error al parsear JSON: {e}")
+        return False
     except Exception as e:
         print(f"❌ Error al escribir archivo HTML: {e}")
         return False
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+
+# ---------------------------------------------------------
+# CONFIG
+# ---------------------------------------------------------
+HISTORY_DB = "security_scan/reports/history.sqlite"
+# Reglas cuyo snippet incluye datos que cambian entre ejecuciones (p. ej. el
+# conteo de 'var'): su huella se calcula sin el snippet
+VOLATILE_SNIPPET_RULES = {"deprecated_syntax_var"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    label       TEXT,
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    run_id       INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path         TEXT NOT NULL,
+    content_hash TEXT,
+    language     TEXT,
+    verdict      TEXT NOT NULL,
+    score        REAL,
+    ml_prob      REAL,
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id      INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    path        TEXT NOT NULL,
+    type        TEXT NOT NULL,
+    severity    TEXT NOT NULL,
+    line        INTEGER,
+    snippet     TEXT,
+    fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_label ON runs(label, id);
+CREATE INDEX IF NOT EXISTS idx_files_path ON files(path, run_id);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files(content_hash);
+CREATE INDEX IF NOT EXISTS idx_findings_run ON findings(run_id, fingerprint);
+CREATE INDEX IF NOT EXISTS idx_findings_type ON findings(type, run_id);
+CREATE INDEX IF NOT EXISTS idx_findings_path ON findings(path, run_id);
+"""
+
+# ---------------------------------------------------------
+# UTILIDADES
+# ---------------------------------------------------------
+def connect(db_path=HISTORY_DB):
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def content_hash(path):
+    try:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                h.update(chunk)
+        return h.hexdigest()
+    except OSError:
+        return None
+
+def fingerprints(path, findings):
+    """
+    Identidad estable de cada hallazgo: ruta + regla + snippet (sin número
+    de línea, que cambia al editar el archivo). Los hallazgos repetidos se
+    distinguen por su número de aparición.
+    """
+    seen = {}
+    for f in findings:
+        snippet = "" if f["type"] in VOLATILE_SNIPPET_RULES else f["snippet"].strip()
+        key = f"{path}\0{f['type']}\0{snippet}"
+        seen[key] = seen.get(key, 0) + 1
+        yield hashlib.sha1(f"{key}\0{seen[key]}".encode("utf-8")).hexdigest()
+
+# ---------------------------------------------------------
+# ESCRITURA
+# ---------------------------------------------------------
+def record_run(db_path, report, label=None):
+    """
+    Agrega el resultado de un escaneo al historial. Los archivos diferidos
+    por --time-budget no se registran: no tienen veredicto.
+
+    Args:
+        db_path: Ruta a la base SQLite
+        report: dict ruta -> resultado (mismo esquema que security_report.json)
+        label: Etiqueta opcional de la ejecución (rama, commit, PR...)
+    Returns:
+        id de la ejecución registrada
+    """
+    report = {path: data for path, data in report.items() if not data.get("deferred")}
+    conn = connect(db_path)
+    try:
+        with conn:
+            run_id = conn.execute("INSERT INTO runs (label, created_at) VALUES (?, ?)",
+                                  (label, time.time())).lastrowid
+            conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, path, content_hash(path), data["language"], data["verdict"],
+                  data["score"], data["ml_prob"]) for path, data in report.items())
+            )
+            conn.executemany(
+                "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, path, f["type"], f["severity"], f["line"], f["snippet"], fp)
+                 for path, data in report.items()
+                 for f, fp in zip(data["findings"], fingerprints(path, data["findings"])))
+            )
+        return run_id
+    finally:
+        conn.close()
+
+# ---------------------------------------------------------
+# CONSULTAS
+# ---------------------------------------------------------
+def resolve_run(conn, ref):
+    """Acepta un id numérico o una etiqueta (se toma la ejecución más reciente)."""
+    if ref is None:
+        row = conn.execute("SELECT id FROM runs ORDER BY id DESC LIMIT 1").fetchone()
+    elif ref.isdigit():
+        row = conn.execute("SELECT id FROM runs WHERE id = ?", (int(ref),)).fetchone()
+    else:
+        row = conn.execute("SELECT id FROM runs WHERE label = ? ORDER BY id DESC LIMIT 1",
+                           (ref,)).fetchone()
+    if row is None:
+        raise ValueError(f"No existe la ejecución '{ref}' en el historial")
+    return row[0]
+
+_FINDING_COLS = "path, type, severity, line, snippet"
+
+def diff_runs(db_path, base_ref, target_ref=None):
+    """
+    Compara los hallazgos de target contra base. Solo se comparan las rutas
+    analizadas en ambas ejecuciones: un escaneo parcial (archivos cambiados
+    de un PR) no reporta como corregidos los hallazgos de archivos que no
+    volvió a analizar.
+
+    Returns:
+        dict con listas "new", "fixed" y "unchanged" de hallazgos
+    """
+    conn = connect(db_path)
+    try:
+        base = resolve_run(conn, base_ref)
+        target = resolve_run(conn, target_ref)
+
+        def query(sql, *params):
+            cols = ("path", "type", "severity", "line", "snippet")
+            return [dict(zip(cols, row)) for row in conn.execute(sql, params)]
+
+        anti = f"""
+            SELECT {_FINDING_COLS} FROM findings a
+            WHERE a.run_id = ? AND {{neg}} EXISTS (
+                SELECT 1 FROM findings b WHERE b.run_id = ? AND b.fingerprint = a.fingerprint
+            ) AND EXISTS (
+                SELECT 1 FROM files o WHERE o.run_id = ? AND o.path = a.path
+            ) ORDER BY path, line
+        """
+        return {
+            "base_run": base,
+            "target_run": target,
+            "new": query(anti.format(neg="NOT"), target, base, base),
+            "fixed": query(anti.format(neg="NOT"), base, target, target),
+            "unchanged": query(anti.format(neg=""), target, base, base),
+        }
+    finally:
+        conn.close()
+
+def file_trend(db_path, path, limit=50):
+    """Evolución de veredicto, score y ml_prob de un archivo por ejecución."""
+    conn = connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT r.id, r.label, r.created_at, f.content_hash, f.verdict, f.score, f.ml_prob
+            FROM files f JOIN runs r ON r.id = f.run_id
+            WHERE f.path = ? ORDER BY r.id DESC LIMIT ?
+        """, (path, limit)).fetchall()
+    finally:
+        conn.close()
+    cols = ("run_id", "label", "created_at", "content_hash", "verdict", "score", "ml_prob")
+    return [dict(zip(cols, row)) for row in reversed(rows)]
+
+def latest_verdicts(db_path, paths):
+    """Último veredicto registrado de cada ruta (las que no tienen historial se omiten)."""
+    conn = connect(db_path)
+    verdicts = {}
+    try:
+        paths = list(dict.fromkeys(paths))
+        # Lotes por debajo del límite de parámetros de SQLite
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            verdicts.update(conn.execute(f"""
+                SELECT f.path, f.verdict FROM files f
+                WHERE f.path IN ({",".join("?" * len(chunk))})
+                  AND f.run_id = (SELECT MAX(g.run_id) FROM files g WHERE g.path = f.path)
+            """, chunk).fetchall())
+    finally:
+        conn.close()
+    return verdicts
+
+def list_runs(db_path, limit=20):
+    conn = connect(db_path)
+    try:
+        return conn.execute("""
+            SELECT r.id, r.label, r.created_at,
+                   (SELECT COUNT(*) FROM files f WHERE f.run_id = r.id),
+                   (SELECT COUNT(*) FROM findings x WHERE x.run_id = r.id)
+            FROM runs r ORDER BY r.id DESC LIMIT ?
+        """, (limit,)).fetchall()
+    finally:
+        conn.close()
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def main():
+    args = sys.argv[1:]
+    as_json = "--json" in args
+    if as_json:
+        args.remove("--json")
+    db_path = HISTORY_DB
+    if "--db" in args:
+        i = args.index("--db")
+        db_path = args[i + 1]
+        del args[i:i + 2]
+
+    if not args:
+        print("Uso:")
+        print("  python history.py runs [--db historial.sqlite]")
+        print("  python history.py diff <base> [objetivo] [--json] [--db historial.sqlite]")
+        print("  python history.py trend <ruta_archivo> [--json] [--db historial.sqlite]")
+        print("  (<base>/<objetivo>: id de ejecución o etiqueta; objetivo = última ejecución)")
+        sys.exit(1)
+
+    if not os.path.exists(db_path):
+        print(f"❌ No se encontró el historial '{db_path}'")
+        sys.exit(1)
+
+    action = args[0]
+
+    if action == "runs":
+        for run_id, label, created_at, n_files, n_findings in list_runs(db_path):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at))
+            print(f"#{run_id:<6} {when}  {label or '-':<20} archivos: {n_files:<5} hallazgos: {n_findings}")
+
+    elif action == "diff" and len(args) >= 2:
+        try:
+            result = diff_runs(db_path, args[1], args[2] if len(args) > 2 else None)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if as_json:
+            print(json.dumps(result, indent=4, ensure_ascii=False))
+            return
+        print(f"🔍 Ejecución #{result['target_run']} vs base #{result['base_run']}")
+        for key, icon in (("new", "🆕"), ("fixed", "✅"), ("unchanged", "⏸️")):
+            print(f"{icon} {key}: {len(result[key])}")
+        for f in result["new"]:
+            print(f"   + [{f['severity']}] {f['path']}:{f['line']} {f['type']}")
+        for f in result["fixed"]:
+            print(f"   - [{f['severity']}] {f['path']}:{f['line']} {f['type']}")
+
+    elif action == "trend" and len(args) >= 2:
+        rows = file_trend(db_path, args[1])
+        if as_json:
+            print(json.dumps(rows, indent=4))
+            return
+        for r in rows:
+            ml = "omitido" if r["ml_prob"] is None else f"{r['ml_prob']:.4f}"
+            print(f"#{r['run_id']:<6} {r['label'] or '-':<20} {r['verdict']:<9} ml_prob: {ml:<8} score: {r['score']:.4f}")
+
+    else:
+        print("❌ Acción no reconocida")
+
+if __name__ == "__main__":
+    main()
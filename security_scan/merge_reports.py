@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import json
+
+# ---------------------------------------------------------
+# CONFIG
+# ---------------------------------------------------------
+REPORT_FILE = "security_scan/reports/security_report.json"
+SUMMARY_FILE = "security_scan/reports/security_summary.json"
+# Nombre que scanner.py da a cada reporte parcial (shard_report_path)
+SHARD_NAME = re.compile(r"\.shard-(\d+)-of-(\d+)\.json$")
+VERDICTS = ["CRITICAL", "HIGH", "MEDIUM", "SAFE"]
+
+# ---------------------------------------------------------
+# FUSIÓN DE REPORTES
+# ---------------------------------------------------------
+def check_shards(shard_paths, expected=None):
+    """
+    Verifica que estén los N reportes parciales. N se toma de `expected` o,
+    si no se indica, del nombre de los archivos (.shard-i-of-N.json).
+
+    Raises:
+        ValueError si falta algún shard, hay duplicados o N no es coherente
+    """
+    seen = {}
+    totals = set()
+    for path in shard_paths:
+        match = SHARD_NAME.search(os.path.basename(path))
+        if match is None:
+            if expected is None:
+                raise ValueError(f"'{path}' no sigue el formato .shard-i-of-N.json (use --shards N)")
+            continue
+        index, total = int(match.group(1)), int(match.group(2))
+        if index in seen:
+            raise ValueError(f"El shard {index} aparece dos veces: {seen[index]} y {path}")
+        seen[index] = path
+        totals.add(total)
+
+    if expected is None:
+        if len(totals) != 1:
+            raise ValueError(f"Los reportes declaran distinto número de shards: {sorted(totals)}")
+        expected = totals.pop()
+    elif totals - {expected}:
+        raise ValueError(f"Se esperaban {expected} shards pero hay reportes de {sorted(totals - {expected})}")
+
+    if seen:
+        missing = [i for i in range(1, expected + 1) if i not in seen]
+    else:
+        missing = list(range(len(shard_paths) + 1, expected + 1))
+    if missing:
+        raise ValueError(f"Faltan los shards {', '.join(map(str, missing))} de {expected}")
+    if len(shard_paths) != expected:
+        raise ValueError(f"Se esperaban {expected} reportes parciales y se recibieron {len(shard_paths)}")
+    return expected
+
+def merge_reports(shard_paths, file_list_path=None):
+    """
+    Combina los reportes parciales de cada shard en un único reporte con
+    el mismo esquema que genera scanner.py (ruta -> resultado).
+
+    Args:
+        shard_paths: Rutas de los JSON parciales (scanner.py --shard i/N)
+        file_list_path: changed_files.txt opcional para conservar el orden
+                        original; si no se indica, se ordena por ruta
+    Returns:
+        dict con el reporte fusionado
+    """
+    merged = {}
+    for shard_path in shard_paths:
+        with open(shard_path, "r", encoding="utf-8") as f:
+            shard = json.load(f)
+        for path, result in shard.items():
+            if path in merged and merged[path] != result:
+                raise ValueError(f"'{path}' aparece con resultados distintos en varios shards")
+            merged[path] = result
+
+    if file_list_path:
+        with open(file_list_path) as f:
+            order = [line.strip() for line in f if line.strip()]
+        rank = {}
+        for i, path in enumerate(order):
+            rank.setdefault(path, i)
+        keys = sorted(merged, key=lambda p: (rank.get(p, len(rank)), p))
+    else:
+        keys = sorted(merged)
+
+    return {path: merged[path] for path in keys}
+
+def compute_aggregates(report):
+    """Totales por veredicto y lenguaje del reporte fusionado."""
+    by_verdict = {v: 0 for v in VERDICTS}
+    by_language = {}
+    findings = 0
+    for data in report.values():
+        by_verdict[data["verdict"]] = by_verdict.get(data["verdict"], 0) + 1
+        by_language[data["language"]] = by_language.get(data["language"], 0) + 1
+        findings += len(data["findings"])
+    return {
+        "files": len(report),
+        "findings": findings,
+        "by_verdict": by_verdict,
+        "by_language": by_language,
+    }
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def main():
+    args = sys.argv[1:]
+    output = REPORT_FILE
+    summary = SUMMARY_FILE
+    file_list_path = None
+    expected = None
+
+    if "-o" in args:
+        i = args.index("-o")
+        output = args[i + 1]
+        del args[i:i + 2]
+    if "--summary" in args:
+        i = args.index("--summary")
+        summary = args[i + 1]
+        del args[i:i + 2]
+    if "--shards" in args:
+        i = args.index("--shards")
+        expected = int(args[i + 1])
+        del args[i:i + 2]
+    if "--file-list" in args:
+        i = args.index("--file-list")
+        file_list_path = args[i + 1]
+        del args[i:i + 2]
+
+    if not args:
+        print("Uso: python merge_reports.py <shard1.json> [shard2.json ...] [-o salida.json] "
+              "[--summary resumen.json] [--shards N] [--file-list changed_files.txt]")
+        sys.exit(1)
+
+    missing = [p for p in args if not os.path.exists(p)]
+    if missing:
+        print(f"❌ No se encontraron los reportes: {', '.join(missing)}")
+        sys.exit(1)
+
+    try:
+        n_shards = check_shards(args, expected)
+        report = merge_reports(args, file_list_path)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    # Totales recalculados sobre el reporte fusionado (el reporte principal
+    # conserva el esquema ruta -> resultado que lee la política del workflow)
+    stats = compute_aggregates(report)
+    stats["shards"] = n_shards
+    os.makedirs(os.path.dirname(summary) or ".", exist_ok=True)
+    with open(summary, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=4)
+    print(f"📄 Reporte fusionado: {output} ({n_shards} shards) | Resumen: {summary}")
+    print(f"📊 Archivos analizados: {stats['files']} | Hallazgos: {stats['findings']}")
+    print("🧮 " + " | ".join(f"{v}: {n}" for v, n in stats["by_verdict"].items()))
+
+if __name__ == "__main__":
+    main()
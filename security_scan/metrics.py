@@ -0,0 +1,194 @@
+import os
+import math
+import time
+import threading
+import contextlib
+
+# ---------------------------------------------------------
+# 1. REGISTRO DE MÉTRICAS (sin dependencias)
+# ---------------------------------------------------------
+# Formatos de salida:
+#   - Prometheus text 0.0.4 (node_exporter textfile collector)
+#   - OpenMetrics 1.0 (mismo contenido, contadores sin "_total" en TYPE y "# EOF")
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Buckets de latencia en segundos (de 1 ms a 30 s)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if math.isnan(value):
+            return "NaN"
+    return repr(value)
+
+
+class _Metric:
+    def __init__(self, registry, name, help, labels):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name}: se esperaban las etiquetas {self.label_names}")
+        return tuple("unknown" if labels[n] is None else str(labels[n]) for n in self.label_names)
+
+    def value(self, **labels):
+        with self.registry.lock:
+            return self.series.get(self._key(labels), 0)
+
+
+class Counter(_Metric):
+    def total(self):
+        with self.registry.lock:
+            return sum(self.series.values())
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self, openmetrics):
+        sample = self.name + "_total"
+        lines = [f"# HELP {sample if not openmetrics else self.name} {self.help}",
+                 f"# TYPE {sample if not openmetrics else self.name} counter"]
+        for key, value in sorted(self.series.items()):
+            lines.append(f"{sample}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.series[key] = value
+
+    def render(self, openmetrics):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for key, value in sorted(self.series.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, key)} {_number(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    def __init__(self, registry, name, help, labels, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            counts, total, count = self.series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.series[key] = (counts, total + value, count + 1)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def value(self, **labels):
+        with self.registry.lock:
+            return self.series.get(self._key(labels), (None, 0.0, 0))[2]
+
+    def render(self, openmetrics):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.series.items()):
+            for bound, n in zip(self.buckets, counts):
+                le = (("le", _number(float(bound))),)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {n}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.metrics = []
+
+    def _register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(self, name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, help, labels, buckets))
+
+    def render(self, openmetrics=False):
+        with self.lock:
+            lines = []
+            for metric in self.metrics:
+                lines.extend(metric.render(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path, openmetrics=False):
+        """
+        Escritura atómica (archivo temporal + rename), como exige el
+        textfile collector de node_exporter para no leer archivos a medias.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render(openmetrics))
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Expone las métricas en http://host:port/metrics desde un hilo daemon.
+        Responde OpenMetrics si el cliente lo pide en Accept.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = registry.render(openmetrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE_OPENMETRICS if openmetrics else CONTENT_TYPE_PROMETHEUS)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+REGISTRY = Registry()
@@ -66,9 +66,14 @@ def notify_scan_results(report_path, report_url):
         report = json.load(f)
 
     total = len(report)
-    critical = high = medium = 0
+    critical = high = medium = deferred = incomplete = 0
 
     for data in report.values():
+        if data.get("deferred"):
+            deferred += 1
+            continue
+        if data.get("incomplete"):
+            incomplete += 1
         if data["verdict"] == "CRITICAL":
             critical += 1
         elif data["verdict"] == "HIGH":
@@ -76,14 +81,20 @@ def notify_scan_results(report_path, report_url):
         elif data["verdict"] == "MEDIUM":
             medium += 1
 
+    # Archivos que no alcanzaron a analizarse por --time-budget o cuyo
+    # análisis de reglas quedó incompleto por presupuesto de tiempo
+    pending_lines = f"⏳ <b>Diferidos (plazo):</b> {deferred}\n" if deferred else ""
+    if incomplete:
+        pending_lines += f"⏱️ <b>Análisis incompletos (reglas CRITICAL omitidas):</b> {incomplete}\n"
+
     msg = f"""
 🛡️ <b>Resultado de Análisis de Seguridad</b>
-📄 Archivos analizados: {total}
+📄 Archivos analizados: {total - deferred}
 
 🔴 <b>CRITICAL:</b> {critical}
 🟠 <b>HIGH:</b> {high}
 🟡 <b>MEDIUM:</b> {medium}
-
+{pending_lines}
 📄 <b>Reporte completo:</b>
 <a href="{report_url}">{report_url}</a>
 
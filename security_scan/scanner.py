@@ -1,35 +1,62 @@
 import os
-import joblib
+import argparse
 import re
 import json
 import sys
-import numpy as np
-from sklearn.base import BaseEstimator, TransformerMixin
+import time
+import heapq
+import queue
+import threading
+from metrics import REGISTRY
 
 # ---------------------------------------------------------
 # 1. CLASE NECESARIA PARA JOBLIB (No borrar)
 # ---------------------------------------------------------
-class RiskKeywordCounter(BaseEstimator, TransformerMixin):
-    def __init__(self, keywords=[]):
-        self.keywords = keywords
-    def fit(self, X, y=None): return self
-    def transform(self, X):
-        features = []
-        for text in X:
-            if not isinstance(text, str):
-                features.append([0] * (len(self.keywords) + 1))
-                continue
-            text_lower = text.lower()
-            row = [text_lower.count(k.lower()) for k in self.keywords]
-            row.append(len(text) / 1000.0) 
-            features.append(row)
-        return np.array(features)
+# numpy/sklearn solo se importan cuando un pickle pide la clase: pickle
+# resuelve "__main__.RiskKeywordCounter" (o "scanner.RiskKeywordCounter")
+# con getattr sobre el módulo, que cae en __getattr__ (PEP 562). Así una
+# ejecución sin modelos arranca sin cargar dependencias pesadas.
+def _define_risk_keyword_counter():
+    import numpy as np
+    from sklearn.base import BaseEstimator, TransformerMixin
+
+    class RiskKeywordCounter(BaseEstimator, TransformerMixin):
+        def __init__(self, keywords=[]):
+            self.keywords = keywords
+        def fit(self, X, y=None): return self
+        def transform(self, X):
+            features = []
+            for text in X:
+                if not isinstance(text, str):
+                    features.append([0] * (len(self.keywords) + 1))
+                    continue
+                text_lower = text.lower()
+                row = [text_lower.count(k.lower()) for k in self.keywords]
+                row.append(len(text) / 1000.0) 
+                features.append(row)
+            return np.array(features)
+
+    RiskKeywordCounter.__module__ = __name__
+    RiskKeywordCounter.__qualname__ = "RiskKeywordCounter"
+    return RiskKeywordCounter
+
+_LAZY_LOCK = threading.Lock()
+
+def __getattr__(name):
+    if name == "RiskKeywordCounter":
+        with _LAZY_LOCK:
+            if name not in globals():
+                globals()[name] = _define_risk_keyword_counter()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ---------------------------------------------------------
 # 2. CONFIGURACIÓN DEL ROUTER
 # ---------------------------------------------------------
 MODEL_DIR = "security_scan/models"
 REPORT_FILE = "security_scan/reports/security_report.json"
+# Directorio de modelo compacto junto al .pkl (ver compact_model.py)
+COMPACT_SUFFIX = ".compact"
 
 # Mapeo: Extensión -> {Modelo, Lenguaje}
 LANG_MAP = {
@@ -44,6 +71,31 @@ LANG_MAP = {
     ".tsx":  "javascript"
 }
 
+# Métricas de la ejecución (ver metrics.py; --metrics / --metrics-port)
+M_STAGE = REGISTRY.histogram("scanner_stage_duration_seconds", "Latencia por etapa (read, rules, clean, inference)", ("stage",))
+M_BYTES = REGISTRY.counter("scanner_bytes_read", "Bytes de código fuente leídos")
+M_VERDICTS = REGISTRY.counter("scanner_files_scanned", "Archivos analizados por lenguaje y veredicto", ("language", "verdict"))
+M_ML = REGISTRY.counter("scanner_ml_inferences", "Inferencias ML ejecutadas u omitidas por short-circuit", ("outcome",))
+M_MODEL_LOAD = REGISTRY.gauge("scanner_model_load_seconds", "Tiempo de carga de cada modelo", ("language", "format"))
+M_MODEL_CACHE = REGISTRY.counter("scanner_model_cache_requests", "Consultas a la caché de modelos", ("result",))
+M_SCAN_SECONDS = REGISTRY.counter("scanner_scan_seconds", "Tiempo acumulado de escaneo")
+M_FILES_RATE = REGISTRY.gauge("scanner_files_per_second", "Archivos por segundo de escaneo")
+M_BYTES_RATE = REGISTRY.gauge("scanner_bytes_per_second", "Bytes por segundo de escaneo")
+M_CACHE_RATIO = REGISTRY.gauge("scanner_model_cache_hit_ratio", "Proporción de aciertos de la caché de modelos")
+M_DEFERRED = REGISTRY.counter("scanner_files_deferred", "Archivos no analizados por agotar --time-budget")
+M_RULES_SKIPPED = REGISTRY.counter("scanner_rules_skipped", "Reglas omitidas o evaluadas parcialmente por límite", ("reason",))
+
+def publish_throughput(elapsed):
+    """Acumula el tiempo de escaneo y recalcula los indicadores derivados."""
+    M_SCAN_SECONDS.inc(elapsed)
+    busy = M_SCAN_SECONDS.total()
+    if busy > 0:
+        M_FILES_RATE.set(M_VERDICTS.total() / busy)
+        M_BYTES_RATE.set(M_BYTES.total() / busy)
+    lookups = M_MODEL_CACHE.total()
+    if lookups:
+        M_CACHE_RATIO.set(M_MODEL_CACHE.value(result="hit") / lookups)
+
 # ---------------------------------------------------------
 # 3. BASE DE DATOS DE REGLAS (HEURÍSTICAS)
 # ---------------------------------------------------------
@@ -73,8 +125,90 @@ RULES_DB = {
     ]
 }
 
+# Ids de regla y severidades internados: todos los hallazgos comparten
+# el mismo objeto str en lugar de una copia por hallazgo. Los patrones se
+# compilan una sola vez por proceso (clave "rx").
+for _rules in RULES_DB.values():
+    for _r in _rules:
+        _r["id"] = sys.intern(_r["id"])
+        _r["sev"] = sys.intern(_r["sev"])
+        _r["rx"] = re.compile(_r["pat"], re.IGNORECASE)
+
+# Límites de ejecución de reglas (ReDoS). Una búsqueda de `re` no se puede
+# interrumpir a la mitad: los patrones marcados como costosos recorren las
+# líneas largas por tramos solapados (costo lineal) y los presupuestos se
+# comprueban entre búsquedas. Las reglas de costo lineal ven la línea entera.
+RULE_CHUNK_CHARS = 1000         # largo de cada tramo para patrones costosos
+RULE_LINE_BUDGET = 1.0          # segundos de reglas por línea
+# Por debajo de este largo ninguna regla se acerca al presupuesto por línea
+# (peor caso < 1 ms): se evita consultar el reloj en cada regla
+RULE_BUDGET_MIN_CHARS = 256
+RULE_FILE_BUDGET = 5.0          # segundos de reglas por archivo
+DEFAULT_RULE_LIMITS = (RULE_CHUNK_CHARS, RULE_LINE_BUDGET, RULE_FILE_BUDGET)
+
+_UNBOUNDED_WILDCARD = re.compile(r'(?<!\\)\.[*+](?!$)')
+_NESTED_QUANTIFIER = re.compile(r'\((?:[^()\\]|\\.)*[*+]\)[*+{]')
+
+def pattern_risks(pat):
+    """Motivos por los que un patrón puede hacer backtracking costoso."""
+    risks = []
+    if not pat.startswith('^') and _UNBOUNDED_WILDCARD.search(pat):
+        # A.*B sin anclar: por cada A, .* recorre la línea y retrocede buscando B
+        risks.append("comodín sin límite seguido de más patrón (costo cuadrático)")
+    if _NESTED_QUANTIFIER.search(pat):
+        risks.append("cuantificadores anidados (costo exponencial)")
+    return risks
+
+# Se marcan al cargar; las reglas con riesgos se evalúan por tramos
+RISKY_RULES = []
+for _lang, _rules in RULES_DB.items():
+    for _r in _rules:
+        _r["risks"] = tuple(pattern_risks(_r["pat"]))
+        if _r["risks"]:
+            RISKY_RULES.append((_lang, _r["id"], _r["risks"]))
+
+# ---------------------------------------------------------
+# 4. MODELO DE RESULTADOS
+# ---------------------------------------------------------
+class Finding:
+    """
+    Hallazgo compacto (__slots__, sin dict por instancia). Se serializa al
+    mismo esquema JSON de siempre solo al escribir el reporte, y admite
+    lectura estilo dict (f["severity"]) para los consumidores existentes.
+    """
+    __slots__ = ("type", "severity", "line", "snippet")
+
+    def __init__(self, type, severity, line, snippet):
+        self.type = type
+        self.severity = severity
+        self.line = line
+        self.snippet = snippet
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __repr__(self):
+        return f"Finding({self.type!r}, {self.severity!r}, {self.line}, {self.snippet!r})"
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "severity": self.severity,
+            "line": self.line,
+            "snippet": self.snippet
+        }
+
+def to_json(obj):
+    """Hook default= de json.dump para los objetos del modelo de resultados."""
+    if isinstance(obj, Finding):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
 # ---------------------------------------------------------
-# 4. FUNCIONES DEL ESCÁNER
+# 5. FUNCIONES DEL ESCÁNER
 # ---------------------------------------------------------
 def clean_code(text):
     if not isinstance(text, str): return ""
@@ -83,47 +217,141 @@ def clean_code(text):
     text = re.sub(r'[^A-Za-z0-9\s\(\)\[\]\{\}\.\_\=\-\"\'\+\%\*\,<>\&]', '', text)
     return text
 
-def scan_file(filepath, lang):
-    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-        raw_code = f.read()
+def read_source(filepath):
+    with M_STAGE.time(stage="read"):
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            M_BYTES.inc(os.fstat(f.fileno()).st_size)
+            return f.read()
 
-    # A. Cargar Modelo Específico
+def resolve_model_path(lang):
     model_name = f"best_model_{lang}.pkl"
     # Ajuste especial para python si usaste el nombre 'hybrid' antes
     if lang == 'python' and not os.path.exists(os.path.join(MODEL_DIR, model_name)):
-        model_name = "best_model_hybrid.pkl" 
-        
-    model_path = os.path.join(MODEL_DIR, model_name)
-    
-    ml_prob = 0.0
-    ml_msg = "Model Not Found"
+        model_name = "best_model_hybrid.pkl"
+    return os.path.join(MODEL_DIR, model_name)
 
-    if os.path.exists(model_path):
+# Cache de modelos: cada pipeline se deserializa una sola vez por ejecución
+_MODEL_CACHE = {}
+
+def load_model(lang):
+    """
+    Devuelve (pipeline, mensaje) para el lenguaje. Si no hay modelo o falla
+    la carga, pipeline es None y el mensaje explica el motivo.
+    """
+    if lang in _MODEL_CACHE:
+        M_MODEL_CACHE.inc(result="hit")
+        return _MODEL_CACHE[lang]
+
+    M_MODEL_CACHE.inc(result="miss")
+    t0 = time.perf_counter()
+    model_path = resolve_model_path(lang)
+    compact_path = os.path.splitext(model_path)[0] + COMPACT_SUFFIX
+    use_compact = os.path.isdir(compact_path)
+    if use_compact:
+        # Un .compact desactualizado (modelo reentrenado sin volver a exportar)
+        # se ignora y se carga el .pkl, que es la fuente de verdad
         try:
-            pipeline = joblib.load(model_path)
-            clean = clean_code(raw_code)
-            ml_prob = pipeline.predict_proba([clean])[0][1]
-            ml_msg = "OK"
+            from compact_model import stale_reason
+            reason = stale_reason(compact_path, model_path)
         except Exception as e:
-            ml_msg = f"Error: {str(e)}"
-    
-    # B. Análisis Estático (Reglas específicas del lenguaje)
+            reason = f"no se pudo verificar ({e})"
+        if reason and os.path.exists(model_path):
+            print(f"⚠️ {compact_path} ignorado: {reason}. Se usa {model_path} "
+                  f"(regenérelo con compact_model.py export)")
+            use_compact = False
+
+    if use_compact:
+        # Formato compacto (compact_model.py export): arrays mmap, carga rápida
+        try:
+            from compact_model import load_compact
+            entry = (load_compact(compact_path), "OK")
+        except Exception as e:
+            entry = (None, f"Error: {str(e)}")
+    elif not os.path.exists(model_path):
+        entry = (None, "Model Not Found")
+    else:
+        try:
+            import joblib
+            entry = (joblib.load(model_path), "OK")
+        except Exception as e:
+            entry = (None, f"Error: {str(e)}")
+
+    if entry[0] is not None:
+        model_format = "compact" if use_compact else "pickle"
+        M_MODEL_LOAD.set(time.perf_counter() - t0, language=lang, format=model_format)
+    _MODEL_CACHE[lang] = entry
+    return entry
+
+def search_chunked(rx, line, chunk, deadline):
+    """
+    Busca rx en tramos de `chunk` caracteres solapados a la mitad: el costo
+    es lineal en el largo de la línea y toda coincidencia de hasta chunk/2
+    caracteres cae entera en algún tramo.
+
+    Returns:
+        (encontrado, completo) — completo es False si se agotó deadline
+    """
+    step = max(1, chunk // 2)
+    for start in range(0, len(line), step):
+        if rx.search(line, start, start + chunk):
+            return True, True
+        if start + chunk >= len(line):
+            break
+        if time.perf_counter() > deadline:
+            return False, False
+    return False, True
+
+def run_rules(raw_code, lang, limits=DEFAULT_RULE_LIMITS):
+    """
+    Aplica las reglas del lenguaje línea por línea.
+
+    Args:
+        limits: (caracteres por tramo para patrones costosos, presupuesto por
+                 línea, presupuesto por archivo), presupuestos en segundos
+    Returns:
+        (hallazgos, omisiones) donde cada omisión es un dict con rule,
+        severity, reason (line_budget | file_budget), first_line y count
+    """
+    t0 = time.perf_counter()
+    chunk, line_budget, file_budget = limits
     findings = []
+    skipped = {}
     lines = raw_code.split('\n')
     rules = RULES_DB.get(lang, [])
 
+    def skip(rule, reason, line_no, count=1):
+        entry = skipped.get((rule["id"], reason))
+        if entry is None:
+            skipped[(rule["id"], reason)] = {"rule": rule["id"], "severity": rule["sev"], "reason": reason,
+                                             "first_line": line_no, "count": count}
+        else:
+            entry["count"] += count
+
     for i, line in enumerate(lines):
         line_clean = line.strip()
         if not line_clean or line_clean.startswith(('/', '*', '#')): continue
-        
-        for r in rules:
-            if re.search(r["pat"], line, re.IGNORECASE):
-                findings.append({
-                    "type": r["id"],
-                    "severity": r["sev"],
-                    "line": i + 1,
-                    "snippet": line_clean[:80]
-                })
+
+        line_start = time.perf_counter()
+        if line_start - t0 > file_budget:
+            # Presupuesto del archivo agotado: el resto de líneas queda sin evaluar
+            for r in rules:
+                skip(r, "file_budget", i + 1, len(lines) - i)
+            break
+
+        timed = len(line) > RULE_BUDGET_MIN_CHARS
+        for j, r in enumerate(rules):
+            if r["risks"] and len(line) > chunk:
+                found, complete = search_chunked(r["rx"], line, chunk, line_start + line_budget)
+            else:
+                found, complete = r["rx"].search(line) is not None, True
+            if found:
+                findings.append(Finding(r["id"], r["sev"], i + 1, line_clean[:80]))
+            elif not complete:
+                skip(r, "line_budget", i + 1)
+            if timed and time.perf_counter() - line_start > line_budget:
+                for rest in rules[j + 1:]:
+                    skip(rest, "line_budget", i + 1)
+                break
 
     if lang == "javascript":
         # Buscamos la palabra 'var' completa (\bvar\b) para no confundir con 'variable'
@@ -138,45 +366,597 @@ def scan_file(filepath, lang):
             if var_count > 10: 
                 severity = "HIGH" 
             
-            findings.append({
-                "type": "deprecated_syntax_var",
-                "severity": severity,
-                "line": 1, # Lo marcamos al inicio del archivo
-                "snippet": f"GLOBAL CHECK: Se detectaron {var_count - 1} usos de 'var'. Use 'let' o 'const' para seguridad de alcance."
-            })
+            findings.append(Finding(
+                "deprecated_syntax_var",
+                severity,
+                1, # Lo marcamos al inicio del archivo
+                f"GLOBAL CHECK: Se detectaron {var_count - 1} usos de 'var'. Use 'let' o 'const' para seguridad de alcance."
+            ))
 
-    # C. Veredicto Híbrido
-    max_severity = 0
-    sev_map = {"CRITICAL": 1.0, "HIGH": 0.8, "MEDIUM": 0.5, "LOW": 0.2}
-    
+    M_STAGE.observe(time.perf_counter() - t0, stage="rules")
+    for entry in skipped.values():
+        M_RULES_SKIPPED.inc(entry["count"], reason=entry["reason"])
+    return findings, list(skipped.values())
+
+SEV_MAP = {"CRITICAL": 1.0, "HIGH": 0.8, "MEDIUM": 0.5, "LOW": 0.2}
+
+def max_severity(findings):
+    top = 0
     for f in findings:
-        s = sev_map.get(f["severity"], 0)
-        if s > max_severity: max_severity = s
-    
-    final_score = max(ml_prob, max_severity)
+        s = SEV_MAP.get(f.severity, 0)
+        if s > top: top = s
+    return top
+
+def ml_can_change_verdict(findings):
+    """
+    final_score = max(ml_prob, max_severity) con ml_prob en [0, 1]: si las
+    reglas ya alcanzan el máximo, la inferencia no cambia score ni veredicto.
+    """
+    return max_severity(findings) < 1.0
+
+def build_result(lang, ml_prob, findings, ml_windows=None, rules_skipped=None):
+    """
+    ml_prob=None indica que la inferencia se omitió (short-circuit).
+    ml_windows: ventanas de mayor riesgo cuando se puntúa por ventanas.
+    rules_skipped: reglas omitidas por límite de tiempo. Si alguna es
+    CRITICAL el análisis queda incompleto ("incomplete": true) y la política
+    del workflow lo trata igual que un archivo diferido.
+    """
+    final_score = max(ml_prob or 0.0, max_severity(findings))
     
     if final_score > 0.8: verdict = "CRITICAL"
     elif final_score > 0.6: verdict = "HIGH"
     elif final_score > 0.4: verdict = "MEDIUM"
     else: verdict = "SAFE"
 
-    return {
+    M_VERDICTS.inc(language=lang, verdict=verdict)
+    result = {
         "language": lang,
         "verdict": verdict,
         "score": round(final_score, 4),
-        "ml_prob": round(ml_prob, 4),
+        "ml_prob": None if ml_prob is None else round(ml_prob, 4),
         "findings": findings
     }
+    if ml_prob is None:
+        result["ml_skipped"] = True
+    if ml_windows is not None:
+        result["ml_windows"] = ml_windows
+    if rules_skipped:
+        result["rules_skipped"] = rules_skipped
+        if any(s["severity"] == "CRITICAL" for s in rules_skipped):
+            result["incomplete"] = True
+    return result
+
+# Puntuación por ventanas: número de ventanas de mayor riesgo en el reporte
+WINDOW_TOP_K = 3
+
+def _advance_lines(text, pos, n):
+    """Avanza n saltos de línea desde pos. Devuelve (posición, líneas avanzadas, fin de texto)."""
+    for moved in range(n):
+        nl = text.find('\n', pos)
+        if nl < 0:
+            return pos, moved, True
+        pos = nl + 1
+    return pos, n, False
+
+def iter_windows(raw_code, size, overlap):
+    """
+    Ventanas (inicio, fin, texto) de `size` líneas que se solapan `overlap`
+    líneas. Recorre el texto por offsets, sin materializar la lista de
+    líneas, así la memoria extra es la de una ventana.
+    """
+    step = max(1, size - overlap)
+    start, pos = 0, 0
+    while True:
+        end_pos, moved, eof = _advance_lines(raw_code, pos, size)
+        if eof:
+            # Última línea sin salto final cuenta como línea; tras un salto
+            # final no queda ninguna (salvo texto vacío: una ventana vacía)
+            partial = 1 if end_pos < len(raw_code) or moved == 0 else 0
+            yield start, start + moved + partial, raw_code[pos:]
+            return
+        yield start, start + size, raw_code[pos:end_pos - 1]
+        if end_pos >= len(raw_code):
+            return  # La ventana llegó justo al final (archivo con salto final)
+        pos, _, _ = _advance_lines(raw_code, pos, step)
+        start += step
+
+def score_windows(pipeline, raw_code, size, overlap, batch_size=16):
+    """
+    Puntúa el archivo por ventanas de líneas, en lotes de batch_size, de
+    modo que la fila de features más grande es la de una ventana y no la
+    del archivo completo. El score del archivo es el máximo de las ventanas.
+
+    Returns:
+        (ml_prob, ventanas de mayor riesgo ordenadas de mayor a menor)
+    """
+    top = []  # heap mínimo de (prob, -inicio, inicio, fin)
+    batch = []
+
+    def flush():
+        probs = pipeline.predict_proba([clean_code(text) for _, _, text in batch])
+        for (start, end, _), p in zip(batch, probs):
+            entry = (p[1], -start, start, end)
+            if len(top) < WINDOW_TOP_K:
+                heapq.heappush(top, entry)
+            else:
+                heapq.heappushpop(top, entry)
+        batch.clear()
+
+    for window in iter_windows(raw_code, size, overlap):
+        batch.append(window)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    ranked = sorted(top, reverse=True)
+    windows = [{"lines": [start + 1, end], "ml_prob": round(p, 4)} for p, _, start, end in ranked]
+    return ranked[0][0], windows
+
+def scan_file(filepath, lang, short_circuit=True, window=None, batch_size=16,
+              rule_limits=DEFAULT_RULE_LIMITS):
+    """
+    window: (líneas, solape) para puntuar por ventanas; None evalúa el
+    archivo completo como un solo documento.
+    rule_limits: límites de las reglas (ver run_rules).
+    """
+    raw_code = read_source(filepath)
+
+    # A. Análisis Estático (Reglas específicas del lenguaje, etapa barata)
+    findings, rules_skipped = run_rules(raw_code, lang, rule_limits)
+
+    # B. Modelo específico del lenguaje (solo si puede cambiar el veredicto)
+    ml_prob = 0.0
+    ml_windows = None
+    pipeline, ml_msg = load_model(lang)
+
+    if pipeline is not None:
+        if short_circuit and not ml_can_change_verdict(findings):
+            ml_prob = None
+            M_ML.inc(outcome="skipped")
+        else:
+            M_ML.inc(outcome="executed")
+            try:
+                with M_STAGE.time(stage="inference"):
+                    if window:
+                        ml_prob, ml_windows = score_windows(pipeline, raw_code, *window, batch_size=batch_size)
+                    else:
+                        clean = clean_code(raw_code)
+                        ml_prob = pipeline.predict_proba([clean])[0][1]
+            except Exception as e:
+                ml_msg = f"Error: {str(e)}"
+
+    # C. Veredicto Híbrido
+    return build_result(lang, ml_prob, findings, ml_windows, rules_skipped)
+
+# ---------------------------------------------------------
+# 6. MODO PIPELINE (I/O y cómputo solapados)
+# ---------------------------------------------------------
+# Etapas conectadas por colas acotadas (backpressure):
+#   lectores (hilos) -> limpieza + reglas -> inferencia por lotes
+# Los resultados se reordenan al final para que el reporte sea idéntico
+# al del modo secuencial.
+_END = object()
+
+def _predict_batch(lang, batch):
+    pipeline, _ = load_model(lang)
+    if pipeline is None:
+        return [0.0] * len(batch)
+    try:
+        return [p[1] for p in pipeline.predict_proba([item["clean"] for item in batch])]
+    except Exception:
+        # Si falla el lote, se evalúa archivo por archivo (igual que scan_file)
+        probs = []
+        for item in batch:
+            try:
+                probs.append(pipeline.predict_proba([item["clean"]])[0][1])
+            except Exception:
+                probs.append(0.0)
+        return probs
+
+def scan_files_pipelined(jobs, readers=4, queue_size=32, batch_size=16, short_circuit=True,
+                         window=None, rule_limits=DEFAULT_RULE_LIMITS, deadline=None):
+    """
+    Escanea una lista de (ruta, lenguaje) solapando lectura de disco,
+    análisis estático e inferencia.
+
+    Args:
+        jobs: Lista de tuplas (ruta, lenguaje) en el orden del reporte
+        readers: Número de hilos lectores
+        queue_size: Capacidad máxima de cada cola entre etapas
+        batch_size: Archivos por llamada a predict_proba
+        short_circuit: Omite la inferencia si las reglas ya deciden
+        window: (líneas, solape) para puntuar por ventanas (ver score_windows)
+        rule_limits: Límites de las reglas (ver run_rules)
+        deadline: Instante (time.perf_counter) a partir del cual no se leen
+                  más archivos; los ya leídos se terminan de analizar
+    Returns:
+        dict ruta -> resultado, en el mismo orden que jobs (sin los que no
+        llegaron a leerse antes de deadline)
+    """
+    read_q = queue.Queue(maxsize=queue_size)
+    infer_q = queue.Queue(maxsize=queue_size)
+    pending = iter(enumerate(jobs))
+    pending_lock = threading.Lock()
+
+    def reader():
+        while True:
+            with pending_lock:
+                expired = deadline is not None and time.perf_counter() >= deadline
+                nxt = None if expired else next(pending, None)
+            if nxt is None:
+                read_q.put(_END)
+                return
+            idx, (path, lang) = nxt
+            try:
+                read_q.put({"idx": idx, "lang": lang, "raw": read_source(path)})
+            except Exception as e:
+                read_q.put({"idx": idx, "error": e})
+
+    def analyzer():
+        finished = 0
+        while finished < readers:
+            item = read_q.get()
+            if item is _END:
+                finished += 1
+                continue
+            if "error" not in item:
+                raw = item.pop("raw")
+                item["findings"], item["rules_skipped"] = run_rules(raw, item["lang"], rule_limits)
+                if load_model(item["lang"])[0] is not None:
+                    if short_circuit and not ml_can_change_verdict(item["findings"]):
+                        item["skipped"] = True
+                        M_ML.inc(outcome="skipped")
+                    elif window:
+                        # Las ventanas se limpian y puntúan por lotes en la etapa de inferencia
+                        item["raw"] = raw
+                    else:
+                        with M_STAGE.time(stage="clean"):
+                            item["clean"] = clean_code(raw)
+            infer_q.put(item)
+        infer_q.put(_END)
+
+    threads = [threading.Thread(target=reader, daemon=True) for _ in range(readers)]
+    threads.append(threading.Thread(target=analyzer, daemon=True))
+    for t in threads:
+        t.start()
+
+    results = [None] * len(jobs)
+    batches = {}
+
+    def flush(lang):
+        batch = batches.pop(lang, [])
+        M_ML.inc(len(batch), outcome="executed")
+        with M_STAGE.time(stage="inference"):
+            probs = _predict_batch(lang, batch)
+        for item, prob in zip(batch, probs):
+            results[item["idx"]] = build_result(lang, prob, item["findings"],
+                                                rules_skipped=item["rules_skipped"])
+
+    while True:
+        item = infer_q.get()
+        if item is _END:
+            break
+        if "error" in item:
+            raise item["error"]
+        if "raw" in item:
+            M_ML.inc(outcome="executed")
+            ml_prob, ml_windows = 0.0, None
+            try:
+                pipeline, _ = load_model(item["lang"])
+                with M_STAGE.time(stage="inference"):
+                    ml_prob, ml_windows = score_windows(pipeline, item["raw"], *window, batch_size=batch_size)
+            except Exception:
+                pass
+            results[item["idx"]] = build_result(item["lang"], ml_prob, item["findings"], ml_windows,
+                                                item["rules_skipped"])
+            continue
+        if "clean" not in item:
+            ml_prob = None if item.get("skipped") else 0.0
+            results[item["idx"]] = build_result(item["lang"], ml_prob, item["findings"],
+                                                rules_skipped=item["rules_skipped"])
+            continue
+        batches.setdefault(item["lang"], []).append(item)
+        if len(batches[item["lang"]]) >= batch_size:
+            flush(item["lang"])
+
+    for lang in list(batches):
+        flush(lang)
+
+    for t in threads:
+        t.join()
+
+    return {path: result for (path, _), result in zip(jobs, results) if result}
+
+# ---------------------------------------------------------
+# 7. PARTICIONADO ENTRE NODOS DE CI (--shard i/N)
+# ---------------------------------------------------------
+def parse_shard(value):
+    try:
+        index, total = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"formato inválido '{value}', se espera i/N (ej. 2/4)")
+    if total < 1 or not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"shard fuera de rango '{value}', se requiere 1 <= i <= N")
+    return index, total
+
+def select_shard(paths, index, total):
+    """
+    Reparte los archivos en N particiones balanceadas por tamaño y devuelve
+    las de la partición index (1..N), conservando el orden original.
+
+    Es determinista: todos los nodos ven el mismo checkout, ordenan por
+    (tamaño desc, ruta) y asignan cada archivo a la partición con menos
+    bytes acumulados (empate -> la de menor índice).
+    """
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    loads = [0] * total
+    mine = set()
+    for path in sorted(set(paths), key=lambda p: (-size(p), p)):
+        target = loads.index(min(loads))
+        loads[target] += size(path)
+        if target == index - 1:
+            mine.add(path)
+    return [p for p in paths if p in mine]
+
+def shard_report_path(index, total):
+    base, ext = os.path.splitext(REPORT_FILE)
+    return f"{base}.shard-{index}-of-{total}{ext}"
+
+# ---------------------------------------------------------
+# 8. PLANIFICACIÓN CON PLAZO (--time-budget)
+# ---------------------------------------------------------
+# Riesgo previo según el último veredicto conocido del archivo. Los archivos
+# sin antecedentes (nuevos en el PR) se consideran de riesgo alto, y los de
+# extensión sin reglas ni modelo casi no aportan al resultado.
+PRIOR_RISK = {"CRITICAL": 1.0, "HIGH": 0.8, "MEDIUM": 0.5, "SAFE": 0.1}
+UNKNOWN_RISK = 0.9
+NO_LANG_RISK = 0.0  # se completan aunque se agote el plazo (ver main)
+# Costo estimado en bytes equivalentes: costo fijo por archivo y factor
+# para lenguajes que solo pasan por reglas (sin inferencia ML)
+FILE_OVERHEAD_BYTES = 4096
+RULES_ONLY_COST = 0.2
+
+def load_prior_verdicts(paths, history_db=None, previous_report=None):
+    """
+    Último veredicto conocido de cada ruta: del historial SQLite si se
+    indica (--history), si no del reporte anterior en la ruta de salida.
+    """
+    if history_db and os.path.exists(history_db):
+        from history import latest_verdicts
+        return latest_verdicts(history_db, paths)
+    if previous_report and os.path.exists(previous_report):
+        from generate_report import iter_report_entries
+        wanted = set(paths)
+        try:
+            return {path: data["verdict"] for path, data in iter_report_entries(previous_report)
+                    if path in wanted and not data.get("deferred")}
+        except (ValueError, KeyError, AttributeError):
+            return {}
+    return {}
+
+def has_model(lang):
+    model_path = resolve_model_path(lang)
+    return (os.path.exists(model_path) or
+            os.path.isdir(os.path.splitext(model_path)[0] + COMPACT_SUFFIX))
+
+def prioritize(jobs, prior):
+    """
+    Ordena los (ruta, lenguaje) para escanear primero lo de mayor valor:
+    riesgo estimado descendente y, a igual riesgo, menor costo estimado
+    (tamaño, y si el lenguaje tiene modelo ML). Es estable respecto al
+    orden de la lista original.
+    """
+    models = {}
+
+    def cost(path, lang):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if lang not in models:
+            models[lang] = lang is not None and has_model(lang)
+        return (size + FILE_OVERHEAD_BYTES) * (1.0 if models[lang] else RULES_ONLY_COST)
+
+    def key(item):
+        idx, (path, lang) = item
+        risk = NO_LANG_RISK if lang is None else PRIOR_RISK.get(prior.get(path), UNKNOWN_RISK)
+        return (-risk, cost(path, lang), idx)
+
+    return [job for _, job in sorted(enumerate(jobs), key=key)]
+
+def build_deferred(lang):
+    """
+    Entrada de un archivo que no se analizó antes del plazo. Conserva el
+    esquema ruta -> resultado para que los consumidores del reporte sigan
+    funcionando; la política del workflow decide cómo tratarlo.
+    """
+    M_DEFERRED.inc()
+    return {
+        "language": lang,
+        "verdict": "DEFERRED",
+        "score": None,
+        "ml_prob": None,
+        "findings": [],
+        "deferred": True
+    }
 
 # ---------------------------------------------------------
-# 5. EJECUCIÓN PRINCIPAL
+# 9. MODO WATCH (desarrollo local)
 # ---------------------------------------------------------
+def write_report(report, output):
+    """Escritura atómica: quien lea el JSON nunca ve un archivo a medias."""
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = output + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, default=to_json)
+    os.replace(tmp, output)
+
+def watch_loop(report, output, short_circuit=True, render_html=False, debounce=0.3, window=None,
+               metrics_file=None, openmetrics=False, rule_limits=DEFAULT_RULE_LIMITS):
+    """
+    Vigila WATCH_DIRS y re-analiza solo los archivos guardados, reutilizando
+    los modelos ya cargados y las reglas compiladas. El reporte JSON se
+    actualiza en el mismo lugar tras cada ráfaga de cambios.
+    """
+    from watch import RESCAN, WATCH_DIRS, create_watcher, list_files, watch_changes
+
+    roots = [d for d in WATCH_DIRS if os.path.isdir(d)]
+    if not roots:
+        print(f"❌ No se encontró ninguno de los directorios a vigilar: {', '.join(WATCH_DIRS)}")
+        sys.exit(1)
+
+    watcher = create_watcher(roots)
+    print(f"👀 Modo watch ({watcher.name}) en: {', '.join(roots)} — Ctrl+C para salir")
+    try:
+        for changed in watch_changes(watcher, debounce):
+            t0 = time.perf_counter()
+            if RESCAN in changed:
+                # Se perdieron eventos: se re-analiza todo lo vigilado y se
+                # descartan del reporte los archivos que ya no existen
+                print("⚠️ Cola de eventos desbordada: re-análisis completo")
+                changed = set(list_files(roots)) | set(report)
+            updated = []
+            for path in sorted(changed):
+                lang = LANG_MAP.get(os.path.splitext(path)[1].lower())
+                if lang is None:
+                    continue
+                if os.path.isfile(path):
+                    report[path] = scan_file(path, lang, short_circuit=short_circuit, window=window,
+                                             rule_limits=rule_limits)
+                elif report.pop(path, None) is None:
+                    continue
+                updated.append(path)
+            if not updated:
+                continue
+
+            write_report(report, output)
+            elapsed = time.perf_counter() - t0
+            publish_throughput(elapsed)
+            if metrics_file:
+                REGISTRY.write_textfile(metrics_file, openmetrics)
+            for path in updated:
+                verdict = report[path]["verdict"] if path in report else "ELIMINADO"
+                print(f"   {verdict:<9} {path}")
+            print(f"🔁 {len(updated)} archivo(s) re-analizados en {elapsed * 1000:.1f} ms → {output}")
+
+            if render_html:
+                from generate_report import generate_html_report
+                generate_html_report(output, os.path.splitext(output)[0] + ".html")
+    except KeyboardInterrupt:
+        print("\n👋 Modo watch finalizado")
+    finally:
+        watcher.close()
+
+# ---------------------------------------------------------
+# 10. EJECUCIÓN PRINCIPAL
+# ---------------------------------------------------------
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="scanner.py",
+        description="Escáner de seguridad híbrido (ML + heurísticas)"
+    )
+    parser.add_argument("file_list", nargs="?",
+                        help="Archivo con la lista de archivos a analizar (changed_files.txt)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Solapa lectura, reglas e inferencia con colas acotadas")
+    parser.add_argument("--readers", type=int, default=4,
+                        help="Hilos lectores en modo pipeline (default: 4)")
+    parser.add_argument("--queue-size", type=int, default=32,
+                        help="Capacidad de las colas entre etapas (default: 32)")
+    parser.add_argument("--batch-size", type=int, default=16,
+                        help="Archivos por lote de inferencia (default: 16)")
+    parser.add_argument("--always-ml", action="store_true",
+                        help="Ejecuta el modelo aunque las reglas ya determinen el veredicto")
+    parser.add_argument("--window", type=int, metavar="LÍNEAS",
+                        help="Puntúa el ML por ventanas de LÍNEAS líneas (score = máximo)")
+    parser.add_argument("--window-overlap", type=int, metavar="LÍNEAS",
+                        help="Solape entre ventanas consecutivas (default: la mitad de --window)")
+    parser.add_argument("--rule-chunk", type=int, default=RULE_CHUNK_CHARS, metavar="CARACTERES",
+                        help=f"Tramo de línea por búsqueda de los patrones costosos (default: {RULE_CHUNK_CHARS})")
+    parser.add_argument("--rule-line-budget", type=float, default=RULE_LINE_BUDGET, metavar="SEGUNDOS",
+                        help=f"Tiempo máximo de reglas por línea (default: {RULE_LINE_BUDGET})")
+    parser.add_argument("--rule-file-budget", type=float, default=RULE_FILE_BUDGET, metavar="SEGUNDOS",
+                        help=f"Tiempo máximo de reglas por archivo (default: {RULE_FILE_BUDGET})")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="Analiza solo la partición i de N (balanceada por tamaño)")
+    parser.add_argument("--output",
+                        help=f"Ruta del reporte JSON (default: {REPORT_FILE}, o uno por shard)")
+    parser.add_argument("--time-budget", type=float, metavar="SEGUNDOS",
+                        help="Plazo total del escaneo: prioriza por riesgo y costo y difiere lo que no alcance")
+    parser.add_argument("--history", metavar="DB",
+                        help="Agrega los resultados a un historial SQLite (ver history.py); "
+                             "con --time-budget también aporta los veredictos previos")
+    parser.add_argument("--run-label",
+                        help="Etiqueta de la ejecución en el historial (rama, commit...)")
+    parser.add_argument("--watch", action="store_true",
+                        help="Vigila frontend/src y backend-secure-login/src y re-analiza al guardar")
+    parser.add_argument("--html", action="store_true",
+                        help="En modo watch, regenera también el reporte HTML")
+    parser.add_argument("--debounce", type=float, default=0.3,
+                        help="Segundos sin cambios antes de re-analizar en modo watch (default: 0.3)")
+    parser.add_argument("--metrics", metavar="ARCHIVO",
+                        help="Escribe métricas de rendimiento (textfile de Prometheus / OpenMetrics)")
+    parser.add_argument("--metrics-format", choices=["prometheus", "openmetrics"], default="prometheus",
+                        help="Formato del archivo de métricas (default: prometheus)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Sirve las métricas en http://127.0.0.1:PUERTO/metrics (útil con --watch)")
+    args = parser.parse_args(argv)
+    if args.file_list is None and not args.watch:
+        parser.error("se requiere <changed_files.txt> (o --watch)")
+    args.window_spec = None
+    if args.window is not None:
+        overlap = args.window // 2 if args.window_overlap is None else args.window_overlap
+        if args.window < 1 or not 0 <= overlap < args.window:
+            parser.error("--window debe ser >= 1 y 0 <= --window-overlap < --window")
+        args.window_spec = (args.window, overlap)
+    if args.rule_chunk < 2 or args.rule_line_budget <= 0 or args.rule_file_budget <= 0:
+        parser.error("--rule-chunk (>= 2), --rule-line-budget y --rule-file-budget deben ser positivos")
+    args.rule_limits = (args.rule_chunk, args.rule_line_budget, args.rule_file_budget)
+    if args.time_budget is not None and args.time_budget <= 0:
+        parser.error("--time-budget debe ser positivo")
+    return args
+
 def main():
     if len(sys.argv) < 2:
-        print("Uso: python scanner.py <changed_files.txt>")
+        print("Uso: python scanner.py <changed_files.txt> [--pipeline] | --watch")
         sys.exit(1)
 
-    file_list_path = sys.argv[1]
+    args = parse_args(sys.argv[1:])
+    started = time.perf_counter()
+    deadline = None if args.time_budget is None else started + args.time_budget
+    output = args.output or (shard_report_path(*args.shard) if args.shard else REPORT_FILE)
+    openmetrics = args.metrics_format == "openmetrics"
+    watch_options = {
+        "short_circuit": not args.always_ml,
+        "render_html": args.html,
+        "debounce": args.debounce,
+        "window": args.window_spec,
+        "metrics_file": args.metrics,
+        "openmetrics": openmetrics,
+        "rule_limits": args.rule_limits,
+    }
+
+    if args.metrics_port:
+        REGISTRY.serve(args.metrics_port)
+        print(f"📈 Métricas en http://127.0.0.1:{args.metrics_port}/metrics")
+
+    if args.file_list is None:
+        # Watch sin lista inicial: se parte del último reporte, si existe
+        report = {}
+        if os.path.exists(output):
+            with open(output, encoding="utf-8") as f:
+                report = json.load(f)
+        watch_loop(report, output, **watch_options)
+        return
+
+    file_list_path = args.file_list
     if not os.path.exists(file_list_path):
         print("❌ No se encontró el archivo de lista de archivos")
         sys.exit(1)
@@ -184,25 +964,87 @@ def main():
     with open(file_list_path) as f:
         files = [line.strip() for line in f if line.strip()]
 
-    report = {}
+    if args.shard:
+        files = select_shard(files, *args.shard)
 
+    jobs = []
     for path in files:
         if not os.path.exists(path):
             continue
 
         ext = os.path.splitext(path)[1].lower()
-        lang = LANG_MAP.get(ext)
+        jobs.append((path, LANG_MAP.get(ext)))
+
+    scan_order = jobs
+    if deadline is not None:
+        prior = load_prior_verdicts([path for path, _ in jobs], args.history, output)
+        scan_order = prioritize(jobs, prior)
+
+    t0 = time.perf_counter()
+    if args.pipeline:
+        report = scan_files_pipelined(
+            scan_order,
+            readers=max(1, args.readers),
+            queue_size=max(1, args.queue_size),
+            batch_size=max(1, args.batch_size),
+            short_circuit=not args.always_ml,
+            window=args.window_spec,
+            rule_limits=args.rule_limits,
+            deadline=deadline
+        )
+    else:
+        report = {}
+        for path, lang in scan_order:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            result = scan_file(path, lang, short_circuit=not args.always_ml,
+                               window=args.window_spec, batch_size=max(1, args.batch_size),
+                               rule_limits=args.rule_limits)
+            if result:
+                report[path] = result
+
+    publish_throughput(time.perf_counter() - t0)
+    deferred = 0
+    if deadline is not None:
+        # Mismo orden que la lista de archivos; lo no analizado queda diferido
+        scanned = report
+        report = {}
+        for path, lang in jobs:
+            if path in report:
+                continue
+            if path in scanned:
+                report[path] = scanned[path]
+            elif lang is None:
+                # Extensión sin reglas ni modelo: el análisis es trivial y
+                # nunca se difiere (no debe bloquear la política por plazo)
+                report[path] = scan_file(path, lang, rule_limits=args.rule_limits)
+            else:
+                report[path] = build_deferred(lang)
+        deferred = sum(1 for data in report.values() if data.get("deferred"))
+    write_report(report, output)
+
+    print(f"📄 Reporte generado: {output}")
+    print(f"📊 Archivos analizados: {len(report) - deferred}")
+    if deferred:
+        print(f"⏳ Plazo de {args.time_budget:g} s agotado: {deferred} archivo(s) diferidos")
+    if M_ML.total():
+        print(f"⚡ Inferencias ML: {M_ML.value(outcome='executed')} ejecutadas, "
+              f"{M_ML.value(outcome='skipped')} omitidas de {M_ML.total()}")
+    limited = [path for path, data in report.items() if data.get("rules_skipped")]
+    if limited:
+        print(f"⏱️ Reglas omitidas por presupuesto de tiempo en {len(limited)} archivo(s) (ver rules_skipped)")
 
-        result = scan_file(path, lang)
-        if result:
-            report[path] = result
+    if args.history:
+        from history import record_run
+        run_id = record_run(args.history, report, label=args.run_label)
+        print(f"🗃️ Historial: ejecución #{run_id} registrada en {args.history}")
 
-    os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
-    with open(REPORT_FILE, "w", encoding="utf-8") as f:
-        json.dump(report, f, indent=4)
+    if args.metrics:
+        REGISTRY.write_textfile(args.metrics, openmetrics)
+        print(f"📈 Métricas: {args.metrics}")
 
-    print(f"📄 Reporte generado: {REPORT_FILE}")
-    print(f"📊 Archivos analizados: {len(report)}")
+    if args.watch:
+        watch_loop(report, output, **watch_options)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,195 @@
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+
+# ---------------------------------------------------------
+# CONFIG
+# ---------------------------------------------------------
+WATCH_DIRS = ["frontend/src", "backend-secure-login/src"]
+IGNORED_DIRS = {"node_modules", "dist", "build", "coverage", ".git", "__pycache__"}
+
+# Máscaras de inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+_EVENT = struct.Struct("iIII")
+
+# Marcador que read() incluye cuando se perdieron eventos (desborde de la
+# cola de inotify): el consumidor debe re-analizar todos los archivos
+RESCAN = object()
+
+def _walk_dirs(root):
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS]
+        yield dirpath
+
+def _listdir(path):
+    """os.listdir que tolera directorios borrados mientras se recorren."""
+    try:
+        return os.listdir(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+def list_files(roots):
+    """Todos los archivos bajo roots (sin IGNORED_DIRS)."""
+    for root in roots:
+        for dirpath in _walk_dirs(root):
+            for f in _listdir(dirpath):
+                path = os.path.join(dirpath, f)
+                if os.path.isfile(path):
+                    yield path
+
+# ---------------------------------------------------------
+# WATCHERS
+# ---------------------------------------------------------
+class InotifyWatcher:
+    """Watcher recursivo basado en inotify (Linux) vía ctypes, sin dependencias."""
+    name = "inotify"
+
+    def __init__(self, roots):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify no disponible en esta plataforma")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self.roots = roots
+        self.dirs = {}
+        self._add_all()
+
+    def _add_all(self):
+        for root in self.roots:
+            for path in _walk_dirs(root):
+                self._add(path)
+
+    def _add(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "límite de inotify alcanzado (fs.inotify.max_user_watches)")
+            return
+        self.dirs[wd] = path
+
+    def read(self, timeout=None):
+        """Espera eventos hasta timeout (segundos) y devuelve las rutas modificadas."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed = set()
+        overflow = False
+        buf = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, offset)
+            name = buf[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # Directorio nuevo: se vigila y se reportan los archivos que ya trae
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.basename(path) not in IGNORED_DIRS:
+                    for sub in _walk_dirs(path):
+                        self._add(sub)
+                        changed.update(os.path.join(sub, f) for f in _listdir(sub)
+                                       if os.path.isfile(os.path.join(sub, f)))
+                continue
+            changed.add(path)
+
+        if overflow:
+            # Pudieron perderse directorios nuevos: se vuelven a vigilar todos
+            # (inotify_add_watch sobre uno ya vigilado devuelve el mismo wd)
+            self._add_all()
+            changed.add(RESCAN)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Alternativa portable: compara (mtime, tamaño) de los archivos cada intervalo."""
+    name = "polling"
+
+    def __init__(self, roots, interval=1.0):
+        self.roots = roots
+        self.interval = interval
+        self.state = self._snapshot()
+
+    def _snapshot(self):
+        state = {}
+        for root in self.roots:
+            for dirpath in _walk_dirs(root):
+                for f in _listdir(dirpath):
+                    path = os.path.join(dirpath, f)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    if os.path.isfile(path):
+                        state[path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def read(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            time.sleep(wait)
+            current = self._snapshot()
+            changed = {p for p in current.keys() | self.state.keys()
+                       if current.get(p) != self.state.get(p)}
+            self.state = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(roots, poll_interval=1.0):
+    """inotify si está disponible; si no, polling."""
+    try:
+        return InotifyWatcher(roots)
+    except (OSError, AttributeError):
+        return PollingWatcher(roots, poll_interval)
+
+def watch_changes(watcher, debounce=0.3):
+    """
+    Genera conjuntos de rutas cambiadas. Agrupa ráfagas de eventos (un
+    guardado del editor suele producir varios) hasta que pasan `debounce`
+    segundos sin actividad.
+    """
+    while True:
+        changed = watcher.read()
+        while True:
+            more = watcher.read(timeout=debounce)
+            if not more:
+                break
+            changed |= more
+        if changed:
+            yield changed